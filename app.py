@@ -2,82 +2,188 @@ import streamlit as st
 import pandas as pd
 import altair as alt
 from wordcloud import WordCloud
-import matplotlib.pyplot as plt
-import json
 import pydeck as pdk
 import os
 import plotly.express as px
 import sys
+import time
+import hashlib
+import io
 
 ROOT_PATH = ""
 
 sys.path.append(ROOT_PATH)
 from utils.load_pipeline import *
+from utils.registry import ModelRegistry
+from utils.columnar import read_table
+from utils.cubes import DashboardCubes
+from utils.encoding import ENCODED_FOLDER, LINK_TABLES, encode_lazily, is_encoded, load_encoded
+from utils.filter_index import FILTER_DIMENSIONS
+from utils.geo import load_centroids
+from utils.graph import GRAPH_FOLDER, GraphStore, build_graph_store, is_graph_store
+from utils.sql_backend import DuckDBBackend, duckdb_available
+from utils.profiling import PROFILER
+from utils.search import SEARCH_FOLDER, SearchIndex, build_search_index, is_search_index
+from utils.similarity import SIMILARITY_FOLDER, SimilarityIndex, build_similarity_index, is_similarity_index, vectorizer_fingerprint
 
 DATA_PATH = os.path.join(ROOT_PATH, "data/processed/")
 PIPELINE_PATH = os.path.join(ROOT_PATH, "models/pipeline/pipeline.pkl")
+TOKENIZER_PATH = os.path.join(ROOT_PATH, "models/tokenizer.json")
+PIPELINE_ARTIFACT_PATH = os.path.join(ROOT_PATH, "models/pipeline/artifact")
+MODEL_REGISTRY_PATH = os.path.join(ROOT_PATH, "models/registry")
 SUBJECTS_PATH = os.path.join(ROOT_PATH, "data/processed/subjects.csv")
+PREDICTION_CACHE_SIZE = 1024
+PREDICTION_CACHE_TTL = 60 * 60
 GEOJSON_PATH = os.path.join(ROOT_PATH, "notebooks/data_visualization/countries.geo.json")
+COUNTRY_CENTROIDS_PATH = os.path.join(ROOT_PATH, "notebooks/data_visualization/country_centroids.csv")
+KEYWORD_CLOUD_MAX_WORDS = 150
+# The keyword filter offers the keywords of the most papers, not all of them
+KEYWORD_FILTER_OPTIONS = 1000
+# "pandas" answers the charts from in-memory cubes, "duckdb" with SQL over the processed files
+DASHBOARD_BACKEND = os.environ.get("DASHBOARD_BACKEND", "pandas")
+
+# Columns each dashboard table is read with; the Parquet copies only read these from disk
+DASHBOARD_COLUMNS = {
+    "papers": ["id", "publication_name", "publish_date"],
+    "affiliations": ["id", "country"],
+    "classification_codes": ["name", "code", "abbreviation"],
+    "paper_to_classification_code": ["paper_id", "code"],
+    "paper_to_affiliation": ["paper_id", "id"],
+    "paper_to_keyword": ["id", "keyword"],
+    "author_pub_counts": ["name", "publication_count"],
+}
+# Columns of the papers shown as search results and similar papers
+RESULT_PAPER_COLUMNS = ["id", "title", "publication_name", "publish_date"]
+SIMILAR_PAPERS = 10
+# Authors offered in the co-author lookup, most co-authors first
+GRAPH_AUTHOR_OPTIONS = 200
+
+def load_data(table: str) -> pd.DataFrame:
+    return read_table(DATA_PATH, table, DASHBOARD_COLUMNS.get(table))
 
-@st.cache_data
-def load_data(filename: str) -> pd.DataFrame:
-    return pd.read_csv(os.path.join(DATA_PATH, filename))
-
-@st.cache_data
 def preprocess_papers(df: pd.DataFrame) -> pd.DataFrame:
     if 'publish_date' in df.columns:
         df['publish_date'] = pd.to_datetime(df['publish_date'], errors='coerce')
     return df
 
-def setup_sidebar(papers_df: pd.DataFrame):
+def dataset_version() -> str:
+    # Changes whenever a processed table is rewritten. The dashboard caches are keyed on it together with
+    # the widget values, so Streamlit hashes a short string instead of whole DataFrames on every rerun.
+    stamps = []
+    for folder in (DATA_PATH, os.path.join(DATA_PATH, ENCODED_FOLDER), os.path.join(DATA_PATH, SEARCH_FOLDER),
+                   os.path.join(DATA_PATH, SIMILARITY_FOLDER), os.path.join(DATA_PATH, GRAPH_FOLDER)):
+        if os.path.isdir(folder):
+            for entry in sorted(os.scandir(folder), key=lambda entry: entry.name):
+                if entry.is_file():
+                    stat = entry.stat()
+                    stamps.append(f"{entry.path}:{stat.st_mtime_ns}:{stat.st_size}")
+    return hashlib.blake2b("\n".join(stamps).encode(), digest_size=8).hexdigest()
+
+def setup_sidebar(cubes):
+    # Returns the year range and the other filters as a hashable tuple of (dimension, match, labels)
     st.sidebar.header("Filters")
-    min_year = int(papers_df['publish_date'].dt.year.min()) if papers_df['publish_date'].notnull().any() else 2000
-    max_year = int(papers_df['publish_date'].dt.year.max()) if papers_df['publish_date'].notnull().any() else 2023
-    year_range = st.sidebar.slider("Publication Year Range", min_value=min_year, max_value=max_year, value=(min_year, max_year))
-    return year_range
-
-@st.cache_data
-def load_and_preprocess_data():
-    papers_df = preprocess_papers(load_data("papers.csv"))
-    affiliations_df = load_data("affiliations.csv")
-    classification_codes_df = load_data("classification_codes.csv")
-    paper_to_classification_code_df = load_data("paper_to_classification_code.csv")
-    paper_to_affiliation_df = load_data("paper_to_affiliation.csv")
-    paper_to_keyword_df = load_data("paper_to_keyword.csv")
-    author_pub_counts_df = load_data("author_pub_counts.csv")
-    return (papers_df, affiliations_df, classification_codes_df,
-            paper_to_classification_code_df, paper_to_affiliation_df,
-            paper_to_keyword_df, author_pub_counts_df)
-
-@st.cache_data
+    min_year = int(cubes.years.min()) if len(cubes.years) else 2000
+    max_year = int(cubes.years.max()) if len(cubes.years) else 2023
+    year_range = st.sidebar.slider("Publication Year Range", min_value=min_year, max_value=max_year, value=(min_year, max_year), key="year_range")
+    if not cubes.supports_filters:
+        return year_range, ()
+    # The filter index is built on the first opening; closing the expander clears its filters
+    with st.sidebar.expander("More filters", key="more_filters", on_change="rerun") as more_filters:
+        if not more_filters.open:
+            return year_range, ()
+        st.caption("Values of one filter are combined with OR, filters with AND. Closing this panel clears them.")
+        match = "all" if st.toggle("Papers must match all selected values of a filter", key="match_all") else "any"
+        filters = []
+        for dimension, label in FILTER_DIMENSIONS.items():
+            limit = KEYWORD_FILTER_OPTIONS if dimension == "keyword" else None
+            options = cubes.filter_index.options(dimension, limit)
+            if dimension != "keyword":
+                options = sorted(options)
+            selected = st.multiselect(label, options, key=f"filter_{dimension}")
+            if selected:
+                filters.append((dimension, match, tuple(sorted(selected))))
+    return year_range, tuple(filters)
+
+def keep_sidebar_state():
+    # The sidebar is only drawn while the dashboard tab is open. Streamlit drops the state of widgets that
+    # are not drawn in a rerun, unless it is written back to the session state.
+    for key in ["year_range", "more_filters", "match_all"] + [f"filter_{dimension}" for dimension in FILTER_DIMENSIONS]:
+        if key in st.session_state:
+            st.session_state[key] = st.session_state[key]
+
+# Each table is loaded when a section first needs it, once per dataset version, and shared read-only by
+# every session and rerun; cache_data would hand each call its own unpickled copy
+@PROFILER.cached(st.cache_resource(max_entries=len(DASHBOARD_COLUMNS)))
+def load_dataset_table(table, dataset_version):
+    df = load_data(table)
+    return preprocess_papers(df) if table == "papers" else df
+
+def load_encoded_tables(dataset_version):
+    # The link tables keyed by int32 paper, affiliation, code and keyword keys. Without an encoded
+    # directory (python -m utils.encoding) the string ids are encoded here, each link table when a cube
+    # first needs it; the link tables are read uncached, only their encoded keys are kept.
+    encoded_path = os.path.join(DATA_PATH, ENCODED_FOLDER)
+    if is_encoded(encoded_path):
+        return load_encoded(encoded_path)
+    return encode_lazily(lambda table: load_data(table) if table in LINK_TABLES else load_dataset_table(table, dataset_version))
+
+# Built once per process; every chart is then a sum over a slice of years of these cubes.
+# Only the papers are loaded here, the cubes of the other charts and the tables they need are built
+# when their section is opened.
+@PROFILER.cached(st.cache_resource(max_entries=1))
+def load_dashboard_cubes(dataset_version):
+    load_table = lambda table: load_dataset_table(table, dataset_version)
+    if DASHBOARD_BACKEND == "duckdb":
+        if duckdb_available():
+            return DuckDBBackend(DATA_PATH, load_table)
+        st.warning("DASHBOARD_BACKEND=duckdb but duckdb is not installed, using the pandas backend.")
+    return DashboardCubes(load_table("papers"), load_table, load_encoded_tables(dataset_version))
+
+# The precomputed centroid table (python -m utils.geo), or computed from the GeoJSON once per process
+@PROFILER.cached(st.cache_resource)
+def load_country_centroids():
+    return load_centroids(COUNTRY_CENTROIDS_PATH, GEOJSON_PATH)
+
+# cache_resource shares one registry across sessions instead of handing each rerun a pickled copy
+@PROFILER.cached(st.cache_resource)
+def load_model_registry():
+    # Without a registry manifest, prefer the memory-mapped artifact, which loads in milliseconds
+    # and is shared between processes. The prediction cache saves rescoring the same text on every rerun.
+    fallback_path = PIPELINE_ARTIFACT_PATH if os.path.isdir(PIPELINE_ARTIFACT_PATH) else PIPELINE_PATH
+    return ModelRegistry(MODEL_REGISTRY_PATH, SUBJECTS_PATH, fallback_path=fallback_path,
+                         cache_size=PREDICTION_CACHE_SIZE, cache_ttl=PREDICTION_CACHE_TTL, instrument=True)
+
 def load_pipeline():
-    return Pipeline(PIPELINE_PATH, SUBJECTS_PATH)
+    # Swaps to a newly activated registry version; a prediction already running keeps the pipeline it got.
+    # Returns the registry status of that pipeline with it, for the caches keyed on its version.
+    return load_model_registry().get_with_status()
 
-@st.cache_data
-def get_filtered_papers(papers_df, year_range):
-    return papers_df[
-        (papers_df['publish_date'].dt.year >= year_range[0]) & 
-        (papers_df['publish_date'].dt.year <= year_range[1])
-    ]
+@PROFILER.cached(st.cache_data)
+def get_publications_per_year(_cubes, dataset_version, year_range, filters):
+    return _cubes.publications_per_year(year_range, filters)
 
-@st.cache_data
-def plot_publications_over_time(filtered_papers):
+def plot_publications_over_time(cubes, dataset_version, year_range, filters):
     st.subheader("1. Publications Over Time")
     st.write("Yearly research publication trends.")
-    pub_per_year = filtered_papers.groupby(filtered_papers['publish_date'].dt.year).size().reset_index(name='count')
+    pub_per_year = get_publications_per_year(cubes, dataset_version, year_range, filters)
     line_chart = alt.Chart(pub_per_year).mark_line(point=True).encode(
         x=alt.X('publish_date:O', title='Year'),
         y=alt.Y('count:Q', title='Number of Papers')
     )
     st.altair_chart(line_chart, use_container_width=True)
-    
-@st.cache_data
-def plot_top_journals(filtered_papers):
+
+@PROFILER.cached(st.cache_data)
+def get_top_journals(_cubes, dataset_version, year_range, filters):
+    # Ties are broken by name so CSV and Parquet data give the same chart
+    top_journals = _cubes.journal_counts(year_range, filters).reset_index()
+    top_journals.columns = ['publication_name', 'count']
+    return top_journals.sort_values(['count', 'publication_name'], ascending=[False, True]).head(10)
+
+def plot_top_journals(cubes, dataset_version, year_range, filters):
     st.subheader("2. Top Journals")
     st.write("Most popular journals.")
-    if 'publication_name' in filtered_papers.columns:
-        top_journals = filtered_papers['publication_name'].value_counts().head(10).reset_index()
-        top_journals.columns = ['publication_name', 'count']
+    top_journals = get_top_journals(cubes, dataset_version, year_range, filters)
+    if not top_journals.empty:
         bar_chart = alt.Chart(top_journals).mark_bar().encode(
             x=alt.X('count:Q', title='Count'),
             y=alt.Y('publication_name:N', sort='-x', title='Journal')
@@ -85,21 +191,16 @@ def plot_top_journals(filtered_papers):
         st.altair_chart(bar_chart, use_container_width=True)
     else:
         st.write("No journal information available.")
-    
-@st.cache_data
-def plot_top_classification_codes(filtered_papers, paper_to_classification_code_df, classification_codes_df):
+
+@PROFILER.cached(st.cache_data)
+def get_top_classification_codes(_cubes, dataset_version, year_range, filters):
+    grouped_data = _cubes.classification_code_counts(year_range, filters)
+    return grouped_data.sort_values(['count', 'display_name'], ascending=[False, True]).head(10)
+
+def plot_top_classification_codes(cubes, dataset_version, year_range, filters):
     st.subheader("3. Top Research Classification Codes")
     st.write("Most common research areas.")
-    merged_class = pd.merge(paper_to_classification_code_df, classification_codes_df, on='code', how='inner')
-    merged_class = merged_class[merged_class['paper_id'].isin(filtered_papers['id'])]
-    if 'abbreviation' in merged_class.columns and 'name' in merged_class.columns:
-        merged_class['display_name'] = merged_class['abbreviation']
-        merged_class['full_name'] = merged_class['name']
-    grouped_data = merged_class.groupby('display_name').agg(
-        count=('full_name', 'size'),
-        full_name_list=('full_name', list)
-    ).reset_index()
-    top_codes = grouped_data.sort_values(by='count', ascending=False).head(10)
+    top_codes = get_top_classification_codes(cubes, dataset_version, year_range, filters)
     bar_chart_class = alt.Chart(top_codes).mark_bar().encode(
         x=alt.X('count:Q', title='Count'),
         y=alt.Y('display_name:N', sort='-x', title='Classification Code'),
@@ -111,23 +212,33 @@ def plot_top_classification_codes(filtered_papers, paper_to_classification_code_
     )
     st.altair_chart(bar_chart_class, use_container_width=True)
 
-@st.cache_data
-def get_research_trends_over_time_data(filtered_papers, paper_to_classification_code_df, classification_codes_df):
-    merged_class = pd.merge(paper_to_classification_code_df, classification_codes_df, on='code', how='inner')
-    merged_class = merged_class[merged_class['paper_id'].isin(filtered_papers['id'])]
-    merged_class['year'] = merged_class['paper_id'].map(filtered_papers.set_index('id')['publish_date'].dt.year)
-    if 'abbreviation' in merged_class.columns and 'name' in merged_class.columns:
-        merged_class['display_name'] = merged_class['abbreviation']
-        merged_class['full_name'] = merged_class['name']
-    max_categories = merged_class['display_name'].nunique()
-    return merged_class, max_categories
-
-@st.cache_data
-def get_research_trends_chart(merged_class, top_n):
-    category_counts = merged_class.groupby('display_name').size().reset_index(name='total_count')
+@PROFILER.cached(st.cache_data)
+def get_research_trends_over_time_data(_cubes, dataset_version, year_range, filters):
+    trends = _cubes.classification_code_trends(year_range, filters)
+    max_categories = trends['display_name'].nunique()
+    return trends, max_categories
+
+@PROFILER.cached(st.cache_data)
+def get_research_trends_top_categories(_cubes, dataset_version, year_range, filters, top_n):
+    trends, _ = get_research_trends_over_time_data(_cubes, dataset_version, year_range, filters)
+    category_counts = trends.groupby('display_name')['count'].sum().reset_index(name='total_count')
     top_categories = category_counts.nlargest(top_n, 'total_count')['display_name']
-    merged_class = merged_class[merged_class['display_name'].isin(top_categories)]
-    trends = merged_class.groupby(['year', 'display_name']).size().reset_index(name='count')
+    return trends[trends['display_name'].isin(top_categories)].reset_index(drop=True)
+
+def plot_research_trends_over_time(cubes, dataset_version, year_range, filters):
+    st.subheader("4. Research Category Trends Over Time")
+    st.write("Trends in research areas over time.")
+    _, max_categories = get_research_trends_over_time_data(cubes, dataset_version, year_range, filters)
+    if max_categories == 0:
+        st.write("No classification codes for the selected papers.")
+        return
+    # Filters can leave fewer categories than the slider's range; then all of them are shown
+    if max_categories > 3:
+        top_n = st.slider("Select number of top categories to display:", min_value=3, max_value=max_categories,
+                          value=min(10, max_categories))
+    else:
+        top_n = max_categories
+    trends = get_research_trends_top_categories(cubes, dataset_version, year_range, filters, top_n)
     trend_chart = alt.Chart(trends).mark_line(point=True).encode(
         x=alt.X('year:O', title='Year'),
         y=alt.Y('count:Q', title='Number of Papers'),
@@ -138,114 +249,70 @@ def get_research_trends_chart(merged_class, top_n):
             alt.Tooltip('count:Q', title='Number of Papers')
         ]
     )
-    return trend_chart
-
-def plot_research_trends_over_time(filtered_papers, paper_to_classification_code_df, classification_codes_df):
-    st.subheader("4. Research Category Trends Over Time")
-    st.write("Trends in research areas over time.")
-    merged_class, max_categories = get_research_trends_over_time_data(filtered_papers, paper_to_classification_code_df, classification_codes_df)
-    top_n = st.slider("Select number of top categories to display:", min_value=3, max_value=max_categories, value=10)
-    trend_chart = get_research_trends_chart(merged_class, top_n)
     st.altair_chart(trend_chart, use_container_width=True)
 
-@st.cache_data
-def get_merged_keywords(filtered_papers, paper_to_keyword_df):
-    merged_keywords = paper_to_keyword_df[paper_to_keyword_df['id'].isin(filtered_papers['id'])]
-    if merged_keywords.empty:
+@PROFILER.cached(st.cache_data)
+def get_keyword_cloud_png(_cubes, dataset_version, year_range, filters, max_words):
+    # Rendered once per year range; keywords are drawn whole, sized by how many papers in the range have them
+    frequencies = _cubes.keyword_frequencies(year_range, max_words, filters)
+    if not frequencies:
         return None
-    else:
-        return merged_keywords
-
-@st.cache_data
-def plot_keyword_analysis(filtered_papers, paper_to_keyword_df):
+    wordcloud = WordCloud(
+        background_color="white",
+        width=800,
+        height=400,
+        colormap="viridis",
+        max_words=max_words,
+        max_font_size=100
+    ).generate_from_frequencies(frequencies)
+    buffer = io.BytesIO()
+    wordcloud.to_image().save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def plot_keyword_analysis(cubes, dataset_version, year_range, filters):
     st.subheader("7. Keyword Analysis")
     st.write("Common keywords in research.")
-    merged_keywords = get_merged_keywords(filtered_papers, paper_to_keyword_df)
-    if not merged_keywords.empty:
-        keyword_text = " ".join(merged_keywords['keyword'].dropna().astype(str))
-        wordcloud = WordCloud(
-            background_color="white",
-            width=800,
-            height=400,
-            colormap="viridis",
-            max_words=150,
-            max_font_size=100
-        ).generate(keyword_text)
-
-        fig, ax = plt.subplots(figsize=(10, 5))
-        ax.imshow(wordcloud, interpolation='bilinear')
-        ax.axis('off')
-        st.pyplot(fig)
+    keyword_cloud = get_keyword_cloud_png(cubes, dataset_version, year_range, filters, KEYWORD_CLOUD_MAX_WORDS)
+    if keyword_cloud is not None:
+        st.image(keyword_cloud, use_container_width=True)
     else:
-        st.write("No keywords available for the selected years.")
+        st.write("No keywords available for the selected papers.")
 
-@st.cache_data
-def plot_affiliations_by_country(filtered_papers, paper_to_affiliation_df, affiliations_df):
+@PROFILER.cached(st.cache_data)
+def get_country_bubbles(_cubes, dataset_version, year_range, filters):
+    # One bubble per located country, None without any country information
+    country_counts = _cubes.country_counts(year_range, filters)
+    if country_counts.empty:
+        return None
+    # Data names and their aliases are joined to the GeoJSON name and centroid of the country;
+    # names without a centroid still count towards the size scale, as before
+    country_counts = country_counts.rename_axis('country').reset_index(name='count')
+    country_counts = country_counts.merge(load_country_centroids(), on='country', how='left')
+    country_counts['name'] = country_counts['name'].fillna(country_counts['country'])
+    country_counts = country_counts.groupby('name', sort=False).agg(
+        count=('count', 'sum'), lon=('lon', 'first'), lat=('lat', 'first')
+    ).reset_index()
+    min_count = country_counts['count'].min()
+    max_count = country_counts['count'].max()
+    if max_count == min_count:
+        radius = pd.Series(20000, index=country_counts.index)
+    else:
+        radius = 200000 + (1000000 - 200000) * ((country_counts['count'] - min_count) / (max_count - min_count))
+
+    located = country_counts['lon'].notnull()
+    return pd.DataFrame({
+        'coordinates': country_counts.loc[located, ['lon', 'lat']].values.tolist(),
+        'count': country_counts.loc[located, 'count'],
+        'country': country_counts.loc[located, 'name'],
+        'radius': radius[located],
+        'color': [[255, 140, 0, 150]] * int(located.sum()),
+    })
+
+def plot_affiliations_by_country(cubes, dataset_version, year_range, filters):
     st.subheader("6. Affiliations by Country")
     st.write("Geographic distribution of research.")
-    merged_aff = pd.merge(paper_to_affiliation_df, affiliations_df, left_on='id', right_on='id', how='inner')
-    merged_aff = merged_aff[merged_aff['paper_id'].isin(filtered_papers['id'])]
-    if 'country' in merged_aff.columns:
-        country_counts = merged_aff['country'].value_counts().reset_index()
-        country_counts.columns = ['country', 'count']
-        # Map country names to match geojson data
-        name_mapping = {
-            "Russian Federation": "Russia",
-            "United States": "United States of America",
-            "Viet Nam": "Vietnam",
-            "North Macedonia": "Macedonia",
-            "Democratic Republic Congo": "Democratic Republic of the Congo",
-            "Cote d'Ivoire": "Ivory Coast",
-            "Brunei Darussalam": "Brunei",
-            "Czech Republic": "Czechia",
-            "Syria": "Syrian Arab Republic",
-            "Swaziland": "Eswatini",
-        }
-        country_counts['country'] = country_counts['country'].replace(name_mapping)
-        country_dict = dict(zip(country_counts['country'], country_counts['count']))
-
-        with open(GEOJSON_PATH, 'r') as f:
-            geojson_data = json.load(f)
-
-        bubble_data = []
-        counts = list(country_dict.values())
-        if len(counts) == 0:
-            st.write("No country data available.")
-            return
-        min_count = min(counts)
-        max_count = max(counts)
-
-        def normalize_size(c):
-            if max_count == min_count:
-                return 20000
-            return 200000 + (1000000 - 200000) * ((c - min_count) / (max_count - min_count))
-
-        for feature in geojson_data['features']:
-            country_name = feature['properties'].get('name', None)
-            count = country_dict.get(country_name, 0)
-            if count > 0:
-                geometry = feature['geometry']
-                if geometry['type'] == 'Polygon':
-                    coords = geometry['coordinates'][0]
-                    lon = sum(c[0] for c in coords) / len(coords)
-                    lat = sum(c[1] for c in coords) / len(coords)
-                elif geometry['type'] == 'MultiPolygon':
-                    all_coords = []
-                    for poly in geometry['coordinates']:
-                        all_coords.extend(poly[0])
-                    lon = sum(c[0] for c in all_coords) / len(all_coords)
-                    lat = sum(c[1] for c in all_coords) / len(all_coords)
-                else:
-                    continue
-
-                bubble_data.append({
-                    'coordinates': [lon, lat],
-                    'count': count,
-                    'country': country_name,
-                    'radius': normalize_size(count),
-                    'color': [255, 140, 0, 150]
-                })
-
+    bubble_data = get_country_bubbles(cubes, dataset_version, year_range, filters)
+    if bubble_data is not None:
         layer = pdk.Layer(
             "ScatterplotLayer",
             bubble_data,
@@ -277,103 +344,308 @@ def plot_affiliations_by_country(filtered_papers, paper_to_affiliation_df, affil
     else:
         st.write("No country information available.")
 
-@st.cache_data
-def get_top_authors_publication_distribution_data(author_pub_counts):
+@PROFILER.cached(st.cache_data)
+def get_top_authors_publication_distribution_data(_author_pub_counts, dataset_version):
     author_column = 'name'
-    max_authors = author_pub_counts['name'].nunique()
+    max_authors = _author_pub_counts['name'].nunique()
     return author_column, max_authors
 
-@st.cache_data
-def get_top_authors(author_pub_counts, top_n):
-    return author_pub_counts.nlargest(top_n, 'publication_count')
+@PROFILER.cached(st.cache_data)
+def get_top_authors(_author_pub_counts, dataset_version, top_n):
+    return _author_pub_counts.nlargest(top_n, 'publication_count')
 
-def plot_top_authors_publication_distribution(author_pub_counts):
+def plot_top_authors_publication_distribution(dataset_version):
     st.subheader("5. Top Authors Publication Distribution")
     st.write("Pie chart showing publication contributions by most prolific authors.")
-    author_column, max_authors = get_top_authors_publication_distribution_data(author_pub_counts)
+    author_pub_counts = load_dataset_table("author_pub_counts", dataset_version)
+    author_column, max_authors = get_top_authors_publication_distribution_data(author_pub_counts, dataset_version)
     top_n = st.slider(
         "Select number of top authors to display:", 
         min_value=3, 
         max_value=min(20, max_authors), 
         value=min(10, max_authors)
     )
-    top_authors = get_top_authors(author_pub_counts, top_n)
+    top_authors = get_top_authors(author_pub_counts, dataset_version, top_n)
     fig = px.pie(top_authors, values='publication_count', names=author_column, title='Publication Contributions by Top Authors')
     st.plotly_chart(fig)
 
+# The memory-mapped graph store written by python -m utils.graph, or built in memory once per process
+@PROFILER.cached(st.cache_resource(max_entries=1))
+def load_graph_store(dataset_version):
+    graph_path = os.path.join(DATA_PATH, GRAPH_FOLDER)
+    if is_graph_store(graph_path):
+        return GraphStore.load(graph_path)
+    return build_graph_store(DATA_PATH)
+
+@PROFILER.cached(st.cache_data)
+def get_top_works(_graph, dataset_version, n):
+    # Titles come from the papers table for papers of the corpus, from the references table otherwise
+    top_works = _graph.top_works(n)
+    titles = read_table(DATA_PATH, "references", ["reference_id", "title"]).dropna().drop_duplicates("reference_id")
+    titles = titles.set_index(titles["reference_id"].astype(str))["title"].astype(object)
+    # rename returns a new Series, the cached frame of load_result_papers is shared and must not change
+    paper_titles = load_result_papers(dataset_version)["title"].rename(index=lambda paper_id: paper_id.removeprefix("2-s2.0-"))
+    top_works["title"] = paper_titles.reindex(top_works["work_id"]).fillna(titles.reindex(top_works["work_id"])).to_numpy()
+    return top_works
+
+@PROFILER.cached(st.cache_data)
+def get_graph_authors(_graph, dataset_version, n):
+    return _graph.top_authors(n)
+
+@PROFILER.cached(st.cache_data)
+def get_coauthors(_graph, dataset_version, name, n, hops):
+    return _graph.top_coauthors(name, n), _graph.coauthor_reach(name, hops)
+
+def plot_citation_graph(dataset_version):
+    st.subheader("8. Citations and Co-authors")
+    st.write("Most influential referenced works by PageRank over the citation graph, and who co-authors with whom.")
+    graph = load_graph_store(dataset_version)
+    st.caption(f"{graph.cites.node_count} works with {len(graph.cites.indices)} citations, "
+               f"{graph.coauthors.node_count} authors, over all years")
+    top_works = get_top_works(graph, dataset_version, 10)
+    st.dataframe(pd.DataFrame({
+        "Title": top_works["title"],
+        "Scopus id": top_works["work_id"],
+        "In corpus": top_works["in_corpus"],
+        "Citations": top_works["citations"],
+        "PageRank": top_works["pagerank"],
+    }), hide_index=True, use_container_width=True)
+
+    authors = get_graph_authors(graph, dataset_version, GRAPH_AUTHOR_OPTIONS)
+    if authors.empty:
+        st.write("No co-author information available.")
+        return
+    name = st.selectbox("Author", authors["name"].tolist())
+    hops = st.slider("Co-author hops", min_value=1, max_value=3, value=2)
+    coauthors, reach = get_coauthors(graph, dataset_version, name, 10, hops)
+    st.caption(" ".join(f"{count} authors at {hop + 1} hop{'s' if hop else ''}." for hop, count in enumerate(reach)))
+    if coauthors.empty:
+        st.write("No co-authors found.")
+    else:
+        fig = px.bar(coauthors, x="shared_works", y="name", orientation="h",
+                     labels={"shared_works": "Shared works", "name": "Co-author"}, title=f"Top co-authors of {name}")
+        fig.update_layout(yaxis={"categoryorder": "total ascending"})
+        st.plotly_chart(fig)
+
+def show_dashboard_section(dashboard_open, label, key, plot, *args, expanded=False):
+    # The expander tracks whether it is open and reruns the app when toggled, so a closed section
+    # neither queries nor draws its chart. An open one is timed by the profiler.
+    with st.expander(label, expanded=expanded, key=key, on_change="rerun") as section:
+        if dashboard_open and section.open:
+            with PROFILER.section(label):
+                plot(*args)
+
+def show_performance_panel():
+    with st.sidebar.expander("Performance", expanded=False):
+        st.write("This rerun: time spent getting data (cached functions) and drawing each section.")
+        st.dataframe(pd.DataFrame([
+            {
+                "section": record["section"],
+                "data (ms)": record["data_seconds"] * 1000,
+                "render (ms)": record["render_seconds"] * 1000,
+                "cache hits": record["cache_calls"] - record["cache_misses"],
+                "cache misses": record["cache_misses"],
+            }
+            for record in PROFILER.last_rerun()
+        ]), hide_index=True)
+        st.write("All reruns of this server process.")
+        st.dataframe(pd.DataFrame(PROFILER.section_summary()), hide_index=True)
+        st.dataframe(pd.DataFrame(PROFILER.cache_summary()), hide_index=True)
+        if PROFILER.log_path:
+            st.caption(f"Section timings are logged to {PROFILER.log_path}")
+
+# The memory-mapped index written by python -m utils.search, or built in memory once per process
+@PROFILER.cached(st.cache_resource(max_entries=1))
+def load_search_index(dataset_version):
+    index_path = os.path.join(DATA_PATH, SEARCH_FOLDER)
+    if is_search_index(index_path):
+        return SearchIndex.load(index_path)
+    return build_search_index(DATA_PATH, TOKENIZER_PATH)
+
+@PROFILER.cached(st.cache_resource(max_entries=1))
+def load_result_papers(dataset_version):
+    papers_df = preprocess_papers(read_table(DATA_PATH, "papers", RESULT_PAPER_COLUMNS))
+    return papers_df.drop_duplicates("id").set_index("id")
+
+@PROFILER.cached(st.cache_data)
+def search_papers(_index, dataset_version, query, k):
+    start = time.perf_counter()
+    paper_ids, scores = _index.search(query, k)
+    seconds = time.perf_counter() - start
+    return pd.DataFrame({"id": paper_ids, "score": scores}), seconds
+
+def show_search(dataset_version, query, k):
+    index = load_search_index(dataset_version)
+    results, seconds = search_papers(index, dataset_version, query, k)
+    if results.empty:
+        st.write("No papers found.")
+        return
+    st.caption(f"Top {len(results)} of {index.doc_count} papers by BM25, found in {seconds * 1000:.1f} ms")
+    show_paper_results(dataset_version, results, "Score")
+
+def show_paper_results(dataset_version, results, score_label):
+    papers = load_result_papers(dataset_version).reindex(results["id"])
+    st.dataframe(pd.DataFrame({
+        "Title": papers["title"].to_numpy(),
+        "Journal": papers["publication_name"].astype(object).to_numpy(),
+        "Year": papers["publish_date"].dt.year.astype("Int64").to_numpy(),
+        score_label: results["score"].round(3).to_numpy(),
+        "Scopus id": results["id"].to_numpy(),
+    }), hide_index=True, use_container_width=True)
+
+# The memory-mapped index written by python -m utils.similarity when it was built with the served
+# model's vectorizer, otherwise one built in memory once per model version
+@PROFILER.cached(st.cache_resource(max_entries=1))
+def load_similarity_index(_vectorizer, dataset_version, model_version):
+    index_path = os.path.join(DATA_PATH, SIMILARITY_FOLDER)
+    if is_similarity_index(index_path):
+        index = SimilarityIndex.load(index_path)
+        if index.fingerprint == vectorizer_fingerprint(_vectorizer):
+            return index
+    return build_similarity_index(DATA_PATH, _vectorizer)
+
+@PROFILER.cached(st.cache_data)
+def find_similar_papers(_index, _vectorizer, dataset_version, model_version, text, k):
+    start = time.perf_counter()
+    paper_ids, scores = _index.similar(_vectorizer, text, k)
+    seconds = time.perf_counter() - start
+    return pd.DataFrame({"id": paper_ids, "score": scores}), seconds
+
+def show_similar_papers(pipeline, model_version, text):
+    st.header("Similar papers")
+    version = dataset_version()
+    index = load_similarity_index(pipeline.vectorizer, version, model_version)
+    results, seconds = find_similar_papers(index, pipeline.vectorizer, version, model_version, text, SIMILAR_PAPERS)
+    if results.empty:
+        st.write("No similar papers found.")
+        return
+    st.caption(f"Closest {len(results)} of {index.doc_count} papers by TF-IDF cosine similarity, found in {seconds * 1000:.1f} ms")
+    show_paper_results(version, results, "Similarity")
+
+def show_model_version(status):
+    version = "fallback (no registry manifest)" if status["is_fallback"] else status["version"]
+    loaded_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(status["loaded_at"]))
+    st.caption(f"Model version: {version} (loaded {loaded_at} in {status['reload_seconds']:.2f} s)")
+    if status["last_error"]:
+        st.warning(f"Failed to load the newest model version, still serving {version}: {status['last_error']}")
+
+def show_pipeline_diagnostics(pipeline):
+    with st.expander("Diagnostics", expanded=False):
+        metrics = pipeline.metrics.to_dict()
+        stages = pd.DataFrame([
+            {
+                "stage": stage,
+                "calls": histogram["count"],
+                "mean (ms)": histogram["mean"] * 1000 if histogram["count"] else None,
+                "p50 (ms)": histogram["p50"] * 1000 if histogram["count"] else None,
+                "p95 (ms)": histogram["p95"] * 1000 if histogram["count"] else None,
+                "total (s)": histogram["sum"],
+            }
+            for stage, histogram in metrics["stage_seconds"].items()
+        ])
+        st.write("Time spent in each stage of `Pipeline.predict` (cache misses only).")
+        st.dataframe(stages, hide_index=True)
+        st.write(f"Batches: {metrics['batch_size']['count']}, mean batch size: {metrics['batch_size']['mean'] or 0:.1f}, "
+                 f"mean tokens per batch: {metrics['tokens']['mean'] or 0:.0f}")
+        if pipeline.cache is not None:
+            st.write("Prediction cache:", pipeline.cache.stats())
+        st.code(pipeline.metrics.to_prometheus(), language="text")
+
 def main():
     st.set_page_config(page_title="Research Data Visualization Dashboard", layout="wide", page_icon="📊")
+    PROFILER.start_rerun()
 
-    dashboard_tab, app_demo_tab = st.tabs(["Dashboard", "App Demo"])
+    # The tabs rerun the app when switched, and only the open one does its work: the classifier is loaded
+    # on the first visit to the App Demo tab. Widgets are drawn in both so they keep their state.
+    dashboard_tab, search_tab, app_demo_tab = st.tabs(["Dashboard", "Search", "App Demo"], key="tab", on_change="rerun")
 
     with dashboard_tab:
         st.title("Research Data Visualization Dashboard")
         st.markdown("This dashboard provides an overview of research publications data.")
 
-        (papers_df, affiliations_df, classification_codes_df,
-            paper_to_classification_code_df, paper_to_affiliation_df,
-            paper_to_keyword_df, author_pub_counts_df) = load_and_preprocess_data()
-
-        year_range = setup_sidebar(papers_df)
-        filtered_papers = get_filtered_papers(papers_df, year_range)
-        num_filtered_papers = len(filtered_papers)
-        st.markdown(f"**Showing data from {year_range[0]} to {year_range[1]} ({num_filtered_papers} papers)**")
-
-        print("Publication Over Time")
-        with st.expander("Publication Over Time", expanded=True):
-            plot_publications_over_time(filtered_papers)
-
-        print("Top Journals")
-        with st.expander("Top Journals", expanded=True):
-            plot_top_journals(filtered_papers)
-
-        print("Top Research Classification Codes")
-        with st.expander("Top Research Classification Codes", expanded=True):
-            plot_top_classification_codes(filtered_papers, paper_to_classification_code_df, classification_codes_df)
-
-        print("Research Trends Over Time")
-        with st.expander("Research Trends Over Time", expanded=True):
-            plot_research_trends_over_time(filtered_papers, paper_to_classification_code_df, classification_codes_df)
-
-        print("Top Authors Publication Distribution")
-        with st.expander("Top Authors Publication Distribution", expanded=True):
-            plot_top_authors_publication_distribution(author_pub_counts_df)
-
-        print("Affiliations by Country")
-        with st.expander("Affiliations by Country", expanded=True):
-            plot_affiliations_by_country(filtered_papers, paper_to_affiliation_df, affiliations_df)
-
-        print("Keyword Analysis")
-        with st.expander("Keyword Analysis", expanded=True):
-            plot_keyword_analysis(filtered_papers, paper_to_keyword_df)
+        dashboard_open = dashboard_tab.open
+        with PROFILER.section("Setup"):
+            version = dataset_version()
+            if dashboard_open:
+                cubes = load_dashboard_cubes(version)
+                year_range, filters = setup_sidebar(cubes)
+                num_filtered_papers = cubes.paper_count(year_range, filters)
+                matching = " matching the filters" if filters else ""
+                st.markdown(f"**Showing data from {year_range[0]} to {year_range[1]} ({num_filtered_papers} papers{matching})**")
+            else:
+                # No table is loaded until the tab is opened; the closed sections don't use these
+                cubes, year_range, filters = None, None, ()
+                keep_sidebar_state()
+
+        show_dashboard_section(dashboard_open, "Publication Over Time", "section_publications",
+                               plot_publications_over_time, cubes, version, year_range, filters, expanded=True)
+        show_dashboard_section(dashboard_open, "Top Journals", "section_journals",
+                               plot_top_journals, cubes, version, year_range, filters)
+        show_dashboard_section(dashboard_open, "Top Research Classification Codes", "section_classification_codes",
+                               plot_top_classification_codes, cubes, version, year_range, filters)
+        show_dashboard_section(dashboard_open, "Research Trends Over Time", "section_research_trends",
+                               plot_research_trends_over_time, cubes, version, year_range, filters)
+        show_dashboard_section(dashboard_open, "Top Authors Publication Distribution", "section_top_authors",
+                               plot_top_authors_publication_distribution, version)
+        show_dashboard_section(dashboard_open, "Affiliations by Country", "section_affiliations",
+                               plot_affiliations_by_country, cubes, version, year_range, filters)
+        show_dashboard_section(dashboard_open, "Keyword Analysis", "section_keywords",
+                               plot_keyword_analysis, cubes, version, year_range, filters)
+        show_dashboard_section(dashboard_open, "Citations and Co-authors", "section_citations",
+                               plot_citation_graph, version)
 
         st.markdown("**End of Dashboard**")
     
+    with search_tab:
+        st.title("Search Papers")
+        st.write("Full-text search over paper titles and abstracts, ranked by BM25.")
+        query = st.text_input("Search titles and abstracts")
+        k = st.slider("Number of results", min_value=5, max_value=50, value=10)
+        if search_tab.open and query.strip():
+            with PROFILER.section("Search"):
+                show_search(dataset_version(), query.strip(), k)
+
     with app_demo_tab:
-        pipeline = load_pipeline()
+        demo_open = app_demo_tab.open
         st.title("Demo: Predicting Research Subjects and Supergroups from Paper Title and Abstract")
+        if demo_open:
+            with PROFILER.section("Model load"):
+                pipeline, status = load_pipeline()
+                show_model_version(status)
+                model_version = f"{status['version']}:{status['is_fallback']}@{status['loaded_at']}"
 
         st.write("This app predicts the subjects and supergroups of a research paper based on its title and/or abstract.")
         title = st.text_area("Enter paper title and/or abstract here.")
 
-        if title:
-            prediction = pipeline.predict([title])[0]
-
-            st.header("Predicted subjects")
-            subject_full_names = prediction.get_full_names()
-            if len(subject_full_names) == 0:
-                st.write("No subjects predicted.")
-            else:
-                for subject_full_name in prediction.get_full_names():
-                    st.markdown(f"- {subject_full_name}")
-
-            st.header("Predicted supergroups")
-            supergroups = prediction.get_full_names()
-            if len(supergroups) == 0:
-                st.write("No supergroups predicted.")
-            else:
-                for supergroup in prediction.get_supergroups():
-                    st.markdown(f"- {supergroup}")
+        if demo_open:
+            with PROFILER.section("Prediction"):
+                if title:
+                    prediction = pipeline.predict([title])[0]
+
+                    st.header("Predicted subjects")
+                    subject_full_names = prediction.get_full_names()
+                    if len(subject_full_names) == 0:
+                        st.write("No subjects predicted.")
+                    else:
+                        for subject_full_name in prediction.get_full_names():
+                            st.markdown(f"- {subject_full_name}")
+
+                    st.header("Predicted supergroups")
+                    supergroups = prediction.get_full_names()
+                    if len(supergroups) == 0:
+                        st.write("No supergroups predicted.")
+                    else:
+                        for supergroup in prediction.get_supergroups():
+                            st.markdown(f"- {supergroup}")
+
+            if title:
+                with PROFILER.section("Similar papers"):
+                    show_similar_papers(pipeline, model_version, title)
+
+            show_pipeline_diagnostics(pipeline)
+
+    PROFILER.end_rerun()
+    show_performance_panel()
 
 if __name__ == "__main__":
     main()
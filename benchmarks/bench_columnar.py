@@ -0,0 +1,74 @@
+# Compares loading the dashboard tables from the processed CSVs and from their Parquet copies:
+# load time, in-memory DataFrame size and process RSS after loading (each format in a fresh interpreter).
+# Run from the repo root after `python -m utils.columnar`:
+#   python -m benchmarks.bench_columnar
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.common import DATA_PATH
+
+def current_rss_mb():
+    with open("/proc/self/statm") as file:
+        return int(file.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+
+def measure(data_path, fmt):
+    import os
+
+    import pandas as pd
+    from app import DASHBOARD_COLUMNS
+
+    if fmt == "parquet":
+        # Imported up front so the RSS delta only covers the loaded tables
+        import pyarrow.parquet  # noqa: F401
+    rss_before = current_rss_mb()
+    results = {}
+    start = time.perf_counter()
+    for table, columns in DASHBOARD_COLUMNS.items():
+        table_start = time.perf_counter()
+        if fmt == "parquet":
+            df = pd.read_parquet(os.path.join(data_path, f"{table}.parquet"), columns=columns)
+        else:
+            df = pd.read_csv(os.path.join(data_path, f"{table}.csv"), usecols=columns)
+        results[table] = {
+            "load_s": time.perf_counter() - table_start,
+            "memory_mb": df.memory_usage(deep=True).sum() / (1024 * 1024),
+        }
+    return {
+        "total_load_s": time.perf_counter() - start,
+        "total_memory_mb": sum(table["memory_mb"] for table in results.values()),
+        "rss_delta_mb": current_rss_mb() - rss_before,
+        "tables": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data-path", default=DATA_PATH)
+    parser.add_argument("--format", choices=["csv", "parquet"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.format:
+        print(json.dumps(measure(args.data_path, args.format)))
+        return
+
+    runs = {}
+    for fmt in ("csv", "parquet"):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_columnar", "--data-path", args.data_path, "--format", fmt],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        runs[fmt] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"{'table':<32}{'csv s':>10}{'parquet s':>12}{'csv MB':>10}{'parquet MB':>12}")
+    for table in runs["csv"]["tables"]:
+        csv, parquet = runs["csv"]["tables"][table], runs["parquet"]["tables"][table]
+        print(f"{table:<32}{csv['load_s']:>10.3f}{parquet['load_s']:>12.3f}"
+              f"{csv['memory_mb']:>10.1f}{parquet['memory_mb']:>12.1f}")
+    for key in ("total_load_s", "total_memory_mb", "rss_delta_mb"):
+        print(f"{key:<32}{runs['csv'][key]:>10.3f}{runs['parquet'][key]:>12.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# Rerun latency and memory of the Streamlit dashboard with several sessions open at once.
+# Every session is an AppTest of app.py in this process, so they share the app's caches like sessions on
+# one server do. Sessions take turns moving the year slider and the two top-N sliders; each move is a
+# rerun. Moves are drawn from a small pool, so the first use of a move misses the chart caches ("cold") and
+# later uses hit them ("warm"); warm reruns show the fixed cost of a rerun.
+# The first run shows the sections that are open by default; every section is then opened before the
+# moves, unless --default-sections is given.
+# Run from the repo root:
+#   python -m benchmarks.bench_dashboard_sessions --sessions 4 --reruns 20
+import argparse
+import json
+import os
+import random
+import resource
+import time
+
+def current_rss_mb():
+    with open("/proc/self/statm") as file:
+        return int(file.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def random_moves(app, rng, count):
+    # Each move sets every slider: a year range and the two top-N values (categories up to the default 10,
+    # which every year range supports). A session's widget state is then fully given by its last move.
+    years = app.sidebar.slider[0]
+    moves = []
+    for _ in range(count):
+        values = {years.label: tuple(sorted(rng.sample(range(int(years.min), int(years.max) + 1), 2)))}
+        for slider in app.main.slider:
+            values[slider.label] = rng.randint(int(slider.min), min(10, int(slider.max)))
+        moves.append(values)
+    return moves
+
+def open_sections(app):
+    for expander in app.expander:
+        if expander.key and expander.key.startswith("section_"):
+            app.session_state[expander.key] = True
+
+def apply_move(app, move):
+    for slider in app.slider:
+        slider.set_value(move[slider.label])
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app", default="app.py")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--reruns", type=int, default=20, help="Reruns per session")
+    parser.add_argument("--moves", type=int, default=6, help="Size of the pool of slider moves")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--default-sections", action="store_true", help="Keep only the default sections open")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(args.seed)
+    rss_start = current_rss_mb()
+    sessions, first_run_seconds, open_sections_seconds, rss_after_session = [], [], [], []
+    for _ in range(args.sessions):
+        app = AppTest.from_file(os.path.abspath(args.app), default_timeout=600)
+        start = time.perf_counter()
+        app.run()
+        first_run_seconds.append(time.perf_counter() - start)
+        if app.exception:
+            raise RuntimeError(app.exception[0].value)
+        if not args.default_sections:
+            open_sections(app)
+            start = time.perf_counter()
+            app.run()
+            open_sections_seconds.append(time.perf_counter() - start)
+            if app.exception:
+                raise RuntimeError(app.exception[0].value)
+        sessions.append(app)
+        rss_after_session.append(current_rss_mb())
+
+    moves = random_moves(sessions[0], rng, args.moves)
+    seen, cold_seconds, warm_seconds = set(), [], []
+    for _ in range(args.reruns):
+        for app in sessions:
+            move = rng.randrange(len(moves))
+            apply_move(app, moves[move])
+            start = time.perf_counter()
+            app.run()
+            elapsed = time.perf_counter() - start
+            if app.exception:
+                raise RuntimeError(app.exception[0].value)
+            (warm_seconds if move in seen else cold_seconds).append(elapsed)
+            seen.add(move)
+    rss_end = current_rss_mb()
+
+    results = {
+        "sessions": args.sessions,
+        "reruns": len(cold_seconds) + len(warm_seconds),
+        "first_run_s": first_run_seconds[0],
+        "later_session_first_run_s": sum(first_run_seconds[1:]) / max(1, len(first_run_seconds) - 1),
+        "open_sections_s": open_sections_seconds[0] if open_sections_seconds else 0.0,
+        "cold_rerun_mean_ms": sum(cold_seconds) / max(1, len(cold_seconds)) * 1000,
+        "warm_rerun_p50_ms": percentile(warm_seconds, 0.5) * 1000,
+        "warm_rerun_p95_ms": percentile(warm_seconds, 0.95) * 1000,
+        "warm_rerun_mean_ms": sum(warm_seconds) / len(warm_seconds) * 1000,
+        "rss_first_session_mb": rss_after_session[0] - rss_start,
+        "rss_per_extra_session_mb": (rss_after_session[-1] - rss_after_session[0]) / max(1, args.sessions - 1),
+        "rss_after_reruns_mb": rss_end - rss_start,
+    }
+    for key, value in results.items():
+        print(f"{key:<32}{value:>12.4g}")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# Compares MultiOutputClassifier.predict with the fused single-matmul path
+# Run from the repo root: python -m benchmarks.bench_fused_inference
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks.common import PIPELINE_PATH, SUBJECTS_PATH, synthetic_texts
+from utils.load_pipeline import Pipeline
+
+def time_call(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pipeline-path", default=PIPELINE_PATH)
+    parser.add_argument("--subjects-path", default=SUBJECTS_PATH)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 64, 4096])
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    pipeline = Pipeline(args.pipeline_path, args.subjects_path)
+    if pipeline.model is None:
+        raise SystemExit("The sklearn baseline needs a pickled pipeline, not an artifact directory")
+    if pipeline.classifier is pipeline.model:
+        raise SystemExit("The pipeline's model can't be fused, nothing to compare")
+
+    results = []
+    texts = synthetic_texts(max(args.batch_sizes))
+    for batch_size in args.batch_sizes:
+        X = pipeline.vectorizer.transform(texts[:batch_size])
+        if not np.array_equal(pipeline.model.predict(X), pipeline.classifier.predict(X)):
+            raise SystemExit(f"Fused labels differ from the sklearn model at batch size {batch_size}")
+        repeats = max(3, args.repeats if batch_size < 1000 else args.repeats // 4)
+        sklearn_time = time_call(lambda: pipeline.model.predict(X), repeats)
+        fused_time = time_call(lambda: pipeline.classifier.predict(X), repeats)
+        results.append({
+            "batch_size": batch_size,
+            "sklearn_ms": sklearn_time * 1000,
+            "fused_ms": fused_time * 1000,
+            "speedup": sklearn_time / fused_time,
+        })
+        print(f"batch={batch_size:>5}  sklearn={sklearn_time * 1000:9.3f} ms  fused={fused_time * 1000:9.3f} ms  "
+              f"speedup={sklearn_time / fused_time:6.1f}x")
+    print(json.dumps(results))
+
+if __name__ == "__main__":
+    main()
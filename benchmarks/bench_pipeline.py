@@ -0,0 +1,186 @@
+# Benchmark suite for utils/load_pipeline.py: load time, peak RSS after load, single-text latency,
+# batch throughput and per-Prediction name/supergroup resolution cost.
+# Run from the repo root:
+#   python -m benchmarks.bench_pipeline --output bench.json
+#   python -m benchmarks.bench_pipeline --compare bench.json
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.common import PIPELINE_PATH, SUBJECTS_PATH, synthetic_texts
+
+BATCH_SIZES = [1, 16, 64, 256, 1024, 4096]
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def current_rss_mb():
+    # Only available on Linux, elsewhere falls back to the peak
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+    except OSError:
+        return peak_rss_mb()
+
+def measure_load(pipeline_path, subjects_path):
+    # Runs in a fresh interpreter (see run_load_subprocess) so imports and RSS aren't shared with the suite
+    start = time.perf_counter()
+    from utils.load_pipeline import Pipeline
+    import_seconds = time.perf_counter() - start
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    pipeline = Pipeline(pipeline_path, subjects_path)
+    load_seconds = time.perf_counter() - start
+    return {
+        "import_s": import_seconds,
+        "load_s": load_seconds,
+        "rss_after_import_mb": rss_before,
+        "rss_after_load_mb": current_rss_mb(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def run_load_subprocess(pipeline_path, subjects_path, repeats):
+    import numpy as np
+
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_pipeline", "--load-only",
+             "--pipeline-path", pipeline_path, "--subjects-path", subjects_path],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: float(np.median([run[key] for run in runs])) for key in runs[0]}
+
+def measure_latency(pipeline, texts, repeats):
+    import numpy as np
+
+    timings = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        pipeline.predict([texts[i % len(texts)]])
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1000
+    return {
+        "p50_ms": float(np.percentile(timings, 50)),
+        "p99_ms": float(np.percentile(timings, 99)),
+        "mean_ms": float(timings.mean()),
+    }
+
+def measure_throughput(pipeline, texts, batch_sizes, min_texts):
+    results = {}
+    for batch_size in batch_sizes:
+        # Repeat the texts when there are fewer than one batch, so every batch has batch_size texts
+        pool = texts * -(-batch_size // len(texts)) if len(texts) < batch_size else texts
+        batches = max(1, min_texts // batch_size)
+        scored = 0
+        start = time.perf_counter()
+        for i in range(batches):
+            offset = (i * batch_size) % max(1, len(pool) - batch_size)
+            batch = pool[offset:offset + batch_size]
+            pipeline.predict(batch)
+            scored += len(batch)
+        elapsed = time.perf_counter() - start
+        results[str(batch_size)] = {"texts_per_s": scored / elapsed,
+                                    "ms_per_batch": elapsed / batches * 1000}
+    return results
+
+def measure_resolution(pipeline, texts, repeats):
+    predictions = pipeline.predict(texts)
+    labels = sum(len(prediction.indices) for prediction in predictions)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for prediction in predictions:
+            prediction.get_full_names()
+            prediction.get_supergroups()
+    elapsed = time.perf_counter() - start
+    return {
+        "us_per_prediction": elapsed / (repeats * len(predictions)) * 1e6,
+        "us_per_label": elapsed / (repeats * labels) * 1e6 if labels else None,
+        "labels_per_prediction": labels / len(predictions),
+    }
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+def compare(results, baseline):
+    current, previous = flatten(results["metrics"]), flatten(baseline["metrics"])
+    print(f"{'metric':<48}{'baseline':>14}{'current':>14}{'change':>10}")
+    for key, value in current.items():
+        if key in previous and previous[key]:
+            change = (value - previous[key]) / abs(previous[key]) * 100
+            print(f"{key:<48}{previous[key]:>14.4g}{value:>14.4g}{change:>9.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pipeline-path", default=PIPELINE_PATH)
+    parser.add_argument("--subjects-path", default=SUBJECTS_PATH)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--texts", type=int, default=8192, help="Number of synthetic texts")
+    parser.add_argument("--latency-repeats", type=int, default=500)
+    parser.add_argument("--load-repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    parser.add_argument("--load-only", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.load_only:
+        print(json.dumps(measure_load(args.pipeline_path, args.subjects_path)))
+        return
+
+    import numpy as np
+    import scipy
+    import sklearn
+    from utils.load_pipeline import Pipeline
+
+    texts = synthetic_texts(args.texts, seed=args.seed)
+    pipeline = Pipeline(args.pipeline_path, args.subjects_path)
+    metrics = {
+        "load": run_load_subprocess(args.pipeline_path, args.subjects_path, args.load_repeats),
+        "single_text_latency": measure_latency(pipeline, texts, args.latency_repeats),
+        "batch_throughput": measure_throughput(pipeline, texts, args.batch_sizes, min_texts=min(args.texts, 4096)),
+        "prediction_resolution": measure_resolution(pipeline, texts[:2048], repeats=5),
+    }
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "scipy": scipy.__version__,
+            "sklearn": sklearn.__version__,
+        },
+        "config": {
+            "pipeline_path": args.pipeline_path,
+            "texts": args.texts,
+            "seed": args.seed,
+            "vectorizer": type(pipeline.vectorizer).__name__,
+            "classifier": type(pipeline.classifier).__name__,
+        },
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "metrics": metrics,
+    }
+
+    for key, value in flatten(metrics).items():
+        print(f"{key:<48}{value:>14.4g}")
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            compare(results, json.load(file))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import random
+
+DATA_PATH = "data/processed"
+PIPELINE_PATH = "models/pipeline/pipeline.pkl"
+SUBJECTS_PATH = "data/processed/subjects.csv"
+KEYWORDS_PATH = "data/processed/keywords.csv"
+CLASSIFICATION_CODES_PATH = "data/processed/classification_codes.csv"
+
+def synthetic_texts(n, seed=0, title_words=8, abstract_words=120):
+    # Title + abstract shaped texts built from the processed keywords and classification code names,
+    # so their vocabulary overlaps with what the model was trained on
+    import pandas as pd
+
+    keywords = pd.read_csv(KEYWORDS_PATH)["keyword"].dropna().astype(str).tolist()
+    code_names = pd.read_csv(CLASSIFICATION_CODES_PATH)["name"].dropna().astype(str).tolist()
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(n):
+        title = " ".join(rng.choices(keywords, k=title_words))
+        abstract = " ".join(rng.choices(keywords, k=abstract_words) + rng.choices(code_names, k=3))
+        texts.append(title + " " + abstract)
+    return texts
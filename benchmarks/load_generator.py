@@ -0,0 +1,78 @@
+# Load generator for utils.server: runs concurrent keep-alive clients against /predict
+# and reports p50/p99 latency and throughput.
+# Run from the repo root while the server is up: python -m benchmarks.load_generator --concurrency 32
+import argparse
+import asyncio
+import json
+import time
+
+import numpy as np
+
+from benchmarks.common import synthetic_texts
+
+async def post_json(reader, writer, host, path, payload):
+    body = json.dumps(payload).encode("utf-8")
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+async def client(host, port, texts, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for text in texts:
+            start = time.perf_counter()
+            status = await post_json(reader, writer, host, "/predict", {"text": text})
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+async def run(host, port, concurrency, requests):
+    texts = synthetic_texts(requests)
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, texts[i::concurrency], latencies, statuses) for i in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "elapsed_s": elapsed,
+        "throughput_rps": requests / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+        "statuses": statuses,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    for concurrency in args.concurrency:
+        result = asyncio.run(run(args.host, args.port, concurrency, args.requests))
+        print(f"concurrency={concurrency:>4}  {result['throughput_rps']:8.1f} req/s  "
+              f"p50={result['p50_ms']:7.2f} ms  p99={result['p99_ms']:7.2f} ms  statuses={result['statuses']}")
+        print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
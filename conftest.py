@@ -0,0 +1 @@
+# Puts the repo root on sys.path, so the tests import utils like the app and the CLIs do
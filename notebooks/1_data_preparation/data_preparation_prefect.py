@@ -4,6 +4,7 @@ import json
 from pathlib import Path
 from genson import SchemaBuilder
 from typing import List
+import sys
 
 @flow(log_prints=True)
 def data_preparation():
@@ -573,6 +574,35 @@ def data_preparation():
     with open(PROCESSED_DATA_FOLDER_PATH.joinpath('keywords.csv'), 'w') as file:
         keywords_df.to_csv(file, index=False)
 
+    # %% [markdown]
+    # ## 6. Columnar export
+
+    # %%
+    # Parquet copies of the processed tables, read by the dashboard instead of the CSVs when present
+    sys.path.append("../..")
+    from utils.columnar import convert_directory, parquet_available
+
+    if parquet_available():
+        print(convert_directory(PROCESSED_DATA_FOLDER_PATH))
+
+    # %% [markdown]
+    # ## 7. Key encoding
+
+    # %%
+    # Dense int32 keys for papers, affiliations, codes and keywords, and the link tables rewritten to them
+    from utils.encoding import encode_directory
+
+    encode_directory(PROCESSED_DATA_FOLDER_PATH)
+
+    # %% [markdown]
+    # ## 8. Citation and co-author graphs
+
+    # %%
+    # CSR adjacency arrays of references and paper_reference_author, memory-mapped by the dashboard
+    from utils.graph import GRAPH_FOLDER, build_graph_store
+
+    build_graph_store(PROCESSED_DATA_FOLDER_PATH).save(PROCESSED_DATA_FOLDER_PATH.joinpath(GRAPH_FOLDER))
+
 
 if __name__ == "__main__":
     data_preparation.serve(
@@ -1,7 +1,13 @@
+import sys
+
 import streamlit as st
 import pandas as pd
 import networkx as nx
 import plotly.express as px
+import plotly.graph_objects as go
+
+sys.path.append("../..")
+from utils.cooccurrence import load_keyword_cooccurrence
 
 # --- Load data ---
 
@@ -33,6 +39,69 @@ def load_classification_codes():
     return classification_codes
 
 
+@st.cache_resource
+def load_cooccurrence():
+    return load_keyword_cooccurrence("../../data/processed")
+
+
+# Cached per year range and pruning settings; only the top-N subgraph reaches networkx
+@st.cache_data
+def keyword_subgraph(year_range, top_n, min_count):
+    return load_cooccurrence().top_subgraph(year_range, top_n, min_count)
+
+
+@st.cache_data
+def keyword_graph_layout(nodes, edges):
+    graph = nx.Graph()
+    graph.add_nodes_from(nodes["keyword"])
+    graph.add_weighted_edges_from(edges.itertuples(index=False, name=None))
+    return nx.spring_layout(graph, weight="weight", seed=0)
+
+
+def keyword_graph_figure(nodes, edges):
+    positions = keyword_graph_layout(nodes, edges)
+    edge_x, edge_y = [], []
+    for source, target in zip(edges["source"], edges["target"]):
+        edge_x += [positions[source][0], positions[target][0], None]
+        edge_y += [positions[source][1], positions[target][1], None]
+    fig = go.Figure()
+    fig.add_trace(
+        go.Scatter(
+            x=edge_x,
+            y=edge_y,
+            mode="lines",
+            line={"width": 0.5, "color": "#999"},
+            hoverinfo="none",
+        )
+    )
+    fig.add_trace(
+        go.Scatter(
+            x=[positions[keyword][0] for keyword in nodes["keyword"]],
+            y=[positions[keyword][1] for keyword in nodes["keyword"]],
+            mode="markers+text",
+            text=nodes["keyword"],
+            textposition="top center",
+            marker={
+                "size": 8 + 24 * nodes["papers"] / nodes["papers"].max(),
+                "color": nodes["cooccurrences"],
+                "colorscale": "Viridis",
+                "showscale": True,
+                "colorbar": {"title": "Co-occurrences"},
+            },
+            customdata=nodes[["papers", "cooccurrences"]],
+            hovertemplate="%{text}<br>%{customdata[0]} papers<br>%{customdata[1]} co-occurrences<extra></extra>",
+        )
+    )
+    fig.update_layout(
+        title="Keyword co-occurrence graph",
+        showlegend=False,
+        height=700,
+        xaxis={"visible": False},
+        yaxis={"visible": False},
+    )
+    return fig
+
+
 papers = load_papers()
 paper_to_keyword = load_paper_to_keyword()
 paper_to_classification_code = load_paper_to_classification_code()
@@ -43,7 +112,7 @@ classification_codes = load_classification_codes()
 st.sidebar.title("Navigation")
 page = st.sidebar.radio("Go to", ["Visualizations", "About"])
 
-papers_tab, tab2, tab3 = st.tabs(["Papers", "Tab 2", "Tab 3"])
+papers_tab, keywords_tab, tab3 = st.tabs(["Papers", "Keywords", "Tab 3"])
 
 # Home
 if page == "Visualizations":
@@ -72,11 +141,28 @@ if page == "Visualizations":
         paper_to_classification_code.info()
         papers_by_year_by_abbreviation = (
             papers.rename(columns={"id": "paper_id"})
-            .join(paper_to_classification_code, on="paper_id")
-            .join(classification_codes, on="code")
+            .merge(paper_to_classification_code, on="paper_id")
+            .merge(classification_codes, on="code")
         )
         st.write(papers_by_year_by_abbreviation)
 
+    with keywords_tab:
+        st.title("Keywords")
+
+        # Keyword co-occurrence graph
+        first_year, last_year = load_cooccurrence().year_bounds()
+        year_range = st.slider(
+            "Year range", first_year, last_year, (first_year, last_year)
+        )
+        top_n = st.slider("Keywords", 10, 200, 50)
+        min_count = st.number_input("Minimum papers per pair", 1, 100, 2)
+        nodes, edges = keyword_subgraph(year_range, top_n, min_count)
+        if edges.empty:
+            st.write("No keyword pairs found in enough papers.")
+        else:
+            st.plotly_chart(keyword_graph_figure(nodes, edges))
+            st.write(edges)
+
 # About
 elif page == "About":
     st.title("About")
@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from tokenizers import Tokenizer
+
+TOKENIZER_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "models", "tokenizer.json")
+
+@pytest.fixture(scope="session")
+def tokenizer():
+    return Tokenizer.from_file(TOKENIZER_PATH)
+
+@pytest.fixture(scope="session")
+def dashboard_tables():
+    # Small processed tables with the awkward cases of the real ones: papers without a date or journal,
+    # codes sharing an abbreviation, affiliations without a country, keywords missing, and links to ids
+    # missing from their table
+    rng = np.random.default_rng(0)
+    paper_count = 400
+    papers = pd.DataFrame({
+        "id": [f"2-s2.0-{85000000000 + i}" for i in range(paper_count)],
+        "publication_name": rng.choice([f"Journal {name}" for name in "ABCDEFGH"] + [None], paper_count),
+        "publish_date": pd.to_datetime(rng.choice(pd.date_range("2010-01-01", "2020-12-31").to_numpy(), paper_count)),
+    })
+    papers.loc[rng.random(paper_count) < 0.05, "publish_date"] = pd.NaT
+    codes = np.arange(1000, 1012)
+    classification_codes = pd.DataFrame({
+        "name": [f"Subject {code}" for code in codes],
+        "code": codes,
+        "abbreviation": rng.choice(["AGRI", "BIOC", "CHEM", "COMP", "ENGI", "MEDI"], len(codes)),
+    })
+    affiliations = pd.DataFrame({
+        "id": np.arange(1, 31),
+        "country": rng.choice(["Thailand", "Japan", "United States", "Germany", None], 30),
+    })
+    linked_papers = lambda count: rng.choice(np.append(papers["id"].to_numpy(), "2-s2.0-1"), count)
+    return {
+        "papers": papers,
+        "classification_codes": classification_codes,
+        "affiliations": affiliations,
+        "paper_to_classification_code": pd.DataFrame({
+            "paper_id": linked_papers(900),
+            "code": rng.choice(np.append(codes, 9999), 900),
+        }),
+        "paper_to_affiliation": pd.DataFrame({
+            "paper_id": linked_papers(700),
+            "id": rng.choice(np.append(affiliations["id"].to_numpy(), 999), 700),
+        }),
+        "paper_to_keyword": pd.DataFrame({
+            "id": linked_papers(1200),
+            "keyword": rng.choice([f"keyword {i:02d}" for i in range(50)] + [None], 1200),
+        }),
+    }
@@ -0,0 +1,62 @@
+import pandas as pd
+
+# The dashboard charts computed the way the app did before the cubes: merges and groupbys over the
+# processed tables, restricted to the papers of the year range (and of the filters, when given)
+
+def selected_papers(tables, year_range, paper_ids=None):
+    papers = tables["papers"]
+    years = papers["publish_date"].dt.year
+    papers = papers[(years >= year_range[0]) & (years <= year_range[1])]
+    return papers if paper_ids is None else papers[papers["id"].isin(paper_ids)]
+
+def publications_per_year(papers):
+    return papers.groupby(papers["publish_date"].dt.year).size().to_dict()
+
+def journal_counts(papers):
+    return papers["publication_name"].value_counts().to_dict()
+
+def code_links(tables, papers):
+    merged = pd.merge(tables["paper_to_classification_code"], tables["classification_codes"], on="code", how="inner")
+    merged = merged[merged["paper_id"].isin(papers["id"])].copy()
+    merged["year"] = merged["paper_id"].map(papers.set_index("id")["publish_date"].dt.year)
+    return merged
+
+def classification_code_counts(tables, papers):
+    # {abbreviation: (count, sorted full names)}
+    grouped = code_links(tables, papers).groupby("abbreviation")["name"]
+    return {abbreviation: (len(names), sorted(names)) for abbreviation, names in grouped}
+
+def classification_code_trends(tables, papers):
+    return code_links(tables, papers).groupby(["year", "abbreviation"]).size().to_dict()
+
+def country_counts(tables, papers):
+    merged = pd.merge(tables["paper_to_affiliation"], tables["affiliations"], on="id", how="inner")
+    return merged[merged["paper_id"].isin(papers["id"])]["country"].value_counts().to_dict()
+
+def keyword_frequencies(tables, papers, limit):
+    links = tables["paper_to_keyword"]
+    counts = links[links["id"].isin(papers["id"])]["keyword"].value_counts().rename("count").reset_index()
+    counts = counts.sort_values(["count", "keyword"], ascending=[False, True]).head(limit)
+    return dict(zip(counts["keyword"], counts["count"]))
+
+def paper_labels(tables, dimension):
+    # (paper id, label) rows of a filter dimension
+    if dimension == "classification_code":
+        merged = pd.merge(tables["paper_to_classification_code"], tables["classification_codes"], on="code", how="inner")
+        return merged[["paper_id", "abbreviation"]].set_axis(["paper_id", "label"], axis=1)
+    if dimension == "country":
+        merged = pd.merge(tables["paper_to_affiliation"], tables["affiliations"], on="id", how="inner")
+        return merged[["paper_id", "country"]].set_axis(["paper_id", "label"], axis=1)
+    return tables["paper_to_keyword"][["id", "keyword"]].set_axis(["paper_id", "label"], axis=1)
+
+def filtered_paper_ids(tables, filters):
+    # Ids of the papers matching every (dimension, match, labels) filter
+    paper_ids = set(tables["papers"]["id"])
+    for dimension, match, labels in filters:
+        rows = paper_labels(tables, dimension)
+        rows = rows[rows["label"].isin(labels)]
+        matched = rows.groupby("paper_id")["label"].nunique()
+        if match == "all":
+            matched = matched[matched == len(set(labels))]
+        paper_ids &= set(matched.index)
+    return paper_ids
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from utils.compaction import compact
+from utils.inference import FusedLinearClassifier, TokenIdVectorizer
+from utils.utils import SerializableTokenizer
+
+TEXTS = [
+    "Graphene oxide anodes for lithium-ion batteries",
+    "Deep learning for medical image segmentation",
+    "Lithium metal batteries: dendrite growth and cycling stability",
+    "A survey of graph neural networks for drug discovery",
+    "Rice yield under drought stress in Thailand",
+    "Graphene membranes for water desalination",
+]
+N_LABELS = 4
+
+@pytest.fixture
+def pipeline(tokenizer):
+    tfidf = TfidfVectorizer(tokenizer=SerializableTokenizer(tokenizer), token_pattern=None).fit(TEXTS)
+    rng = np.random.default_rng(0)
+    weights = rng.normal(size=(len(tfidf.vocabulary_), N_LABELS))
+    # About half of the features have no weight above the threshold for any label
+    weights[rng.random(len(weights)) < 0.5] *= 1e-5
+    classes = np.tile([0, 1], (N_LABELS, 1))
+    return tfidf, TokenIdVectorizer.from_tfidf(tfidf), FusedLinearClassifier(weights, rng.normal(size=N_LABELS), classes)
+
+def kept_features(weights, threshold):
+    return np.abs(weights).max(axis=1) > threshold
+
+def test_pruned_columns_keep_their_values(pipeline):
+    tfidf, vectorizer, classifier = pipeline
+    compact_vectorizer, compact_classifier = compact(vectorizer, classifier, threshold=1e-4, dtype="float64")
+    kept = kept_features(classifier.weights, 1e-4)
+    assert 0 < kept.sum() < len(kept)
+    X = compact_vectorizer.transform(TEXTS)
+    assert X.has_sorted_indices
+    np.testing.assert_allclose(X.toarray(), tfidf.transform(TEXTS).toarray()[:, kept], rtol=1e-12, atol=0)
+    np.testing.assert_array_equal(compact_classifier.weights, classifier.weights[kept])
+
+def test_repeated_compaction_composes_column_maps(pipeline):
+    tfidf, vectorizer, classifier = pipeline
+    once_vectorizer, once_classifier = compact(vectorizer, classifier, threshold=1e-4, dtype="float64")
+    twice_vectorizer, twice_classifier = compact(once_vectorizer, once_classifier, threshold=0.5, dtype="float64")
+    kept = kept_features(classifier.weights, 1e-4) & kept_features(classifier.weights, 0.5)
+    np.testing.assert_allclose(twice_vectorizer.transform(TEXTS).toarray(), tfidf.transform(TEXTS).toarray()[:, kept],
+                               rtol=1e-12, atol=0)
+    np.testing.assert_array_equal(twice_classifier.weights, classifier.weights[kept])
+
+@pytest.mark.parametrize("dtype, tolerance", [("float64", 1e-12), ("float32", 1e-5), ("int8", 2e-2)])
+def test_scores_match_the_classifier_without_the_dropped_features(pipeline, dtype, tolerance):
+    tfidf, vectorizer, classifier = pipeline
+    compact_vectorizer, compact_classifier = compact(vectorizer, classifier, threshold=1e-4, dtype=dtype)
+    weights = np.where(kept_features(classifier.weights, 1e-4)[:, None], classifier.weights, 0)
+    expected = FusedLinearClassifier(weights, classifier.intercepts, classifier.classes).decision_function(tfidf.transform(TEXTS))
+    scores = compact_classifier.decision_function(compact_vectorizer.transform(TEXTS))
+    np.testing.assert_allclose(scores, expected, rtol=0, atol=tolerance)
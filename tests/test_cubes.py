@@ -0,0 +1,52 @@
+import pytest
+
+import dashboard_reference as reference
+from utils.cubes import DashboardCubes
+from utils.encoding import encode_lazily, encode_tables
+
+YEAR_RANGES = [(2010, 2020), (2013, 2015), (2016, 2016), (2005, 2011), (2021, 2030)]
+
+def build_cubes(tables, encoder):
+    encoded = encode_tables(tables) if encoder == "eager" else encode_lazily(tables.__getitem__)
+    return DashboardCubes(tables["papers"], tables.__getitem__, encoded)
+
+@pytest.fixture(scope="module", params=["eager", "lazy"])
+def cubes(request, dashboard_tables):
+    return build_cubes(dashboard_tables, request.param)
+
+def cube_code_counts(cubes, year_range, filters=()):
+    counts = cubes.classification_code_counts(year_range, filters)
+    return {row.display_name: (row.count, sorted(row.full_name_list)) for row in counts.itertuples()}
+
+def cube_code_trends(cubes, year_range, filters=()):
+    trends = cubes.classification_code_trends(year_range, filters)
+    return {(row.year, row.display_name): row.count for row in trends.itertuples()}
+
+@pytest.mark.parametrize("year_range", YEAR_RANGES)
+def test_paper_counts(cubes, dashboard_tables, year_range):
+    papers = reference.selected_papers(dashboard_tables, year_range)
+    assert cubes.paper_count(year_range) == len(papers)
+    per_year = cubes.publications_per_year(year_range)
+    assert dict(zip(per_year["publish_date"], per_year["count"])) == reference.publications_per_year(papers)
+
+@pytest.mark.parametrize("year_range", YEAR_RANGES)
+def test_journal_counts(cubes, dashboard_tables, year_range):
+    papers = reference.selected_papers(dashboard_tables, year_range)
+    assert cubes.journal_counts(year_range).to_dict() == reference.journal_counts(papers)
+
+@pytest.mark.parametrize("year_range", YEAR_RANGES)
+def test_classification_codes(cubes, dashboard_tables, year_range):
+    papers = reference.selected_papers(dashboard_tables, year_range)
+    assert cube_code_counts(cubes, year_range) == reference.classification_code_counts(dashboard_tables, papers)
+    assert cube_code_trends(cubes, year_range) == reference.classification_code_trends(dashboard_tables, papers)
+
+@pytest.mark.parametrize("year_range", YEAR_RANGES)
+def test_country_counts(cubes, dashboard_tables, year_range):
+    papers = reference.selected_papers(dashboard_tables, year_range)
+    assert cubes.country_counts(year_range).to_dict() == reference.country_counts(dashboard_tables, papers)
+
+@pytest.mark.parametrize("year_range", YEAR_RANGES)
+@pytest.mark.parametrize("limit", [5, 1000])
+def test_keyword_frequencies(cubes, dashboard_tables, year_range, limit):
+    papers = reference.selected_papers(dashboard_tables, year_range)
+    assert cubes.keyword_frequencies(year_range, limit) == reference.keyword_frequencies(dashboard_tables, papers, limit)
@@ -0,0 +1,44 @@
+import pytest
+
+import dashboard_reference as reference
+from test_cubes import build_cubes, cube_code_counts, cube_code_trends
+
+YEAR_RANGES = [(2010, 2020), (2013, 2015), (2016, 2016), (2021, 2030)]
+FILTERS = [
+    (("classification_code", "any", ("CHEM",)),),
+    (("classification_code", "any", ("BIOC", "MEDI")),),
+    (("classification_code", "all", ("BIOC", "MEDI")),),
+    (("country", "any", ("Japan", "Thailand")),),
+    (("keyword", "all", ("keyword 03",)),),
+    (("keyword", "any", ("keyword 03", "keyword 17", "no such keyword")),),
+    (("keyword", "all", ("keyword 03", "no such keyword")),),
+    (("classification_code", "any", ("COMP", "ENGI")), ("country", "all", ("Germany",)),
+     ("keyword", "any", tuple(f"keyword {i:02d}" for i in range(25)))),
+]
+
+@pytest.fixture(scope="module")
+def cubes(dashboard_tables):
+    return build_cubes(dashboard_tables, "eager")
+
+@pytest.mark.parametrize("year_range", YEAR_RANGES)
+@pytest.mark.parametrize("filters", FILTERS)
+def test_filtered_queries(cubes, dashboard_tables, year_range, filters):
+    paper_ids = reference.filtered_paper_ids(dashboard_tables, filters)
+    papers = reference.selected_papers(dashboard_tables, year_range, paper_ids)
+    assert cubes.paper_count(year_range, filters) == len(papers)
+    per_year = cubes.publications_per_year(year_range, filters)
+    assert dict(zip(per_year["publish_date"], per_year["count"])) == reference.publications_per_year(papers)
+    assert cubes.journal_counts(year_range, filters).to_dict() == reference.journal_counts(papers)
+    assert cube_code_counts(cubes, year_range, filters) == reference.classification_code_counts(dashboard_tables, papers)
+    assert cube_code_trends(cubes, year_range, filters) == reference.classification_code_trends(dashboard_tables, papers)
+    assert cubes.country_counts(year_range, filters).to_dict() == reference.country_counts(dashboard_tables, papers)
+    assert cubes.keyword_frequencies(year_range, 20, filters) == reference.keyword_frequencies(dashboard_tables, papers, 20)
+
+def test_filter_options(cubes, dashboard_tables):
+    # Labels by number of papers, ties by label
+    for dimension in ("classification_code", "country", "keyword"):
+        rows = reference.paper_labels(dashboard_tables, dimension).dropna().drop_duplicates()
+        rows = rows[rows["paper_id"].isin(dashboard_tables["papers"]["id"])]
+        counts = rows.groupby("label").size().rename("count").reset_index()
+        expected = counts.sort_values(["count", "label"], ascending=[False, True])["label"].tolist()
+        assert cubes.filter_index.options(dimension) == expected
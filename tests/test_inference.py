@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from utils.inference import TokenIdVectorizer
+from utils.utils import SerializableTokenizer
+
+TRAIN_TEXTS = [
+    "Graphene oxide anodes for lithium-ion batteries",
+    "Deep learning for medical image segmentation",
+    "Lithium metal batteries: dendrite growth and cycling stability",
+    "A survey of graph neural networks for drug discovery",
+    "Rice yield under drought stress in Thailand",
+]
+TEXTS = TRAIN_TEXTS + [
+    # Repeated tokens, case, tokens outside the fitted vocabulary, punctuation only, and an empty text
+    "GRAPHENE graphene Graphene battery battery",
+    "Quantum chromodynamics on the lattice",
+    "!!! ... ???",
+    "",
+]
+
+def fit_tfidf(tokenizer, **options):
+    return TfidfVectorizer(tokenizer=SerializableTokenizer(tokenizer), token_pattern=None, **options).fit(TRAIN_TEXTS)
+
+@pytest.mark.parametrize("options", [{}, {"lowercase": False}, {"norm": None}, {"norm": "l1"}, {"smooth_idf": False}])
+def test_transform_matches_tfidf(tokenizer, options):
+    tfidf = fit_tfidf(tokenizer, **options)
+    vectorizer = TokenIdVectorizer.from_tfidf(tfidf)
+    expected = tfidf.transform(TEXTS)
+    X = vectorizer.transform(TEXTS)
+    assert X.shape == expected.shape
+    np.testing.assert_allclose(X.toarray(), expected.toarray(), rtol=1e-12, atol=0)
+
+def test_id_to_column_maps_every_fitted_token(tokenizer):
+    tfidf = fit_tfidf(tokenizer)
+    vectorizer = TokenIdVectorizer.from_tfidf(tfidf)
+    vocab = tokenizer.get_vocab()
+    for token, column in tfidf.vocabulary_.items():
+        assert vectorizer.id_to_column[vocab[token]] == column
+    assert (vectorizer.id_to_column >= 0).sum() == len(tfidf.vocabulary_)
+
+@pytest.mark.parametrize("options", [{"ngram_range": (1, 2)}, {"sublinear_tf": True}, {"binary": True}, {"use_idf": False}])
+def test_unsupported_options_fall_back(tokenizer, options):
+    assert TokenIdVectorizer.from_tfidf(fit_tfidf(tokenizer, **options)) is None
@@ -0,0 +1,88 @@
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from utils.search import BM25_B, BM25_K1, GAP_ESCAPE, SearchIndex, indexed_terms
+
+WORDS = ["graphene", "battery", "lithium", "anode", "deep", "learning", "rice", "drought", "cell", "polymer",
+         "membrane", "water", "network", "graph", "protein", "cancer", "Thailand", "catalyst", "solar", "model"]
+# More documents than a uint16 gap can span, so the posting lists of the rare words need escaped gaps,
+# including gaps of exactly GAP_ESCAPE, from the previous document and from 0
+DOC_COUNT = 70000
+RARE_DOCS = {"zeolite": [2, 67000, 69999], "perovskite": [65535, 68000], "chitosan": [0, 1, 65536, 65537, 69998]}
+QUERIES = ["graphene battery", "zeolite", "perovskite lithium anode", "chitosan membrane water",
+           "deep learning for drought in Thailand", "battery battery battery", "!!!", "unseenword"]
+
+@pytest.fixture(scope="module")
+def corpus():
+    # Most documents are empty, which keeps the index quick to build and the common words' gaps long too
+    rng = np.random.default_rng(0)
+    texts = [" ".join(rng.choice(WORDS, rng.integers(1, 9))) if doc % 7 == 0 else "" for doc in range(DOC_COUNT)]
+    for word, docs in RARE_DOCS.items():
+        for doc in docs:
+            texts[doc] += f" {word}"
+    # Term frequencies are stored capped at 255
+    texts[5] = "battery " * 300
+    return texts, [f"2-s2.0-{doc}" for doc in range(DOC_COUNT)]
+
+@pytest.fixture(scope="module")
+def index(tokenizer, corpus):
+    texts, doc_ids = corpus
+    return SearchIndex.build(tokenizer, texts, doc_ids)
+
+@pytest.fixture(scope="module")
+def reference(tokenizer, corpus):
+    # The posting list of every indexed term as {term: [(document, capped frequency)]}, from plain
+    # per-document token counts, and the number of indexed terms of every document
+    indexed = indexed_terms(tokenizer)
+    postings, lengths = {}, []
+    for doc, encoding in enumerate(tokenizer.encode_batch(corpus[0])):
+        counts = Counter(term for term in encoding.ids if indexed[term])
+        for term, count in sorted(counts.items()):
+            postings.setdefault(term, []).append((doc, min(count, 255)))
+        lengths.append(sum(counts.values()))
+    return postings, np.array(lengths, dtype=np.float64)
+
+def brute_force_search(tokenizer, reference, doc_ids, text, k):
+    postings, lengths = reference
+    indexed = indexed_terms(tokenizer)
+    scores = np.zeros(len(lengths))
+    for term in {term for term in tokenizer.encode(text).ids if indexed[term]}:
+        if term not in postings:
+            continue
+        docs, freqs = np.array(postings[term], dtype=np.int64).T
+        idf = np.log(1 + (len(lengths) - len(docs) + 0.5) / (len(docs) + 0.5))
+        norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths[docs] / lengths.mean())
+        scores[docs] += idf * freqs * (BM25_K1 + 1) / (freqs + norms)
+    candidates = np.flatnonzero(scores)
+    best = candidates[np.lexsort((candidates, -scores[candidates]))][:k]
+    return [doc_ids[doc] for doc in best], scores[best]
+
+def test_escaped_gaps_decode(index, reference):
+    postings, _ = reference
+    assert (np.asarray(index.gaps) == GAP_ESCAPE).any()
+    assert index.offsets[-1] == sum(map(len, postings.values()))
+    for term in postings:
+        docs, freqs = index.postings(term)
+        expected = postings.get(term, [])
+        np.testing.assert_array_equal(docs, [doc for doc, _ in expected])
+        np.testing.assert_array_equal(freqs, [freq for _, freq in expected])
+
+@pytest.mark.parametrize("query", QUERIES)
+@pytest.mark.parametrize("k", [1, 10, 100])
+def test_search_matches_brute_force_bm25(tokenizer, corpus, index, reference, query, k):
+    doc_ids, scores = index.search(query, k)
+    expected_ids, expected_scores = brute_force_search(tokenizer, reference, corpus[1], query, k)
+    assert doc_ids == expected_ids
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+def test_saved_index_searches_the_same(index, tmp_path):
+    index.save(tmp_path)
+    loaded = SearchIndex.load(tmp_path)
+    assert isinstance(loaded.gaps, np.memmap)
+    for query in QUERIES:
+        doc_ids, scores = index.search(query, 10)
+        loaded_ids, loaded_scores = loaded.search(query, 10)
+        assert loaded_ids == doc_ids
+        np.testing.assert_array_equal(loaded_scores, scores)
@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+
+import numpy as np
+from tokenizers import Tokenizer
+
+from utils.inference import FusedLinearClassifier, TokenIdVectorizer
+
+# An artifact is a directory of flat .npy arrays plus the tokenizer and a small manifest.
+# The arrays are opened with np.load(mmap_mode="r"), so processes on one host share their pages.
+# Version 2 added the optional arrays written by utils.compaction.
+FORMAT_VERSION = 2
+SUPPORTED_FORMAT_VERSIONS = (1, 2)
+MANIFEST_FILE = "manifest.json"
+TOKENIZER_FILE = "tokenizer.json"
+ARRAY_FILES = {
+    "weights": "weights.npy",
+    "intercepts": "intercepts.npy",
+    "label_classes": "label_classes.npy",
+    "idf": "idf.npy",
+    "id_to_column": "id_to_column.npy",
+}
+OPTIONAL_ARRAY_FILES = {
+    "column_map": "column_map.npy",
+    "scales": "scales.npy",
+}
+
+def is_artifact(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+def export_artifact(vectorizer, classifier, classes, path):
+    if not isinstance(vectorizer, TokenIdVectorizer) or not isinstance(classifier, FusedLinearClassifier):
+        raise ValueError("Only pipelines with a TokenIdVectorizer and a FusedLinearClassifier can be exported")
+    os.makedirs(path, exist_ok=True)
+    if is_artifact(path):
+        os.remove(os.path.join(path, MANIFEST_FILE))
+    arrays = {
+        "weights": np.ascontiguousarray(classifier.weights),
+        "intercepts": classifier.intercepts,
+        "label_classes": classifier.classes,
+        "idf": vectorizer.idf,
+        "id_to_column": vectorizer.id_to_column,
+    }
+    optional_arrays = {"column_map": vectorizer.column_map, "scales": classifier.scales}
+    for name, filename in ARRAY_FILES.items():
+        np.save(os.path.join(path, filename), arrays[name], allow_pickle=False)
+    for name, filename in OPTIONAL_ARRAY_FILES.items():
+        if optional_arrays[name] is not None:
+            np.save(os.path.join(path, filename), optional_arrays[name], allow_pickle=False)
+        elif os.path.exists(os.path.join(path, filename)):
+            os.remove(os.path.join(path, filename))
+    vectorizer.tokenizer.save(os.path.join(path, TOKENIZER_FILE))
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "classes": [str(c) for c in classes],
+        "lowercase": vectorizer.lowercase,
+        "norm": vectorizer.norm,
+        "arrays": [name for name, array in optional_arrays.items() if array is not None],
+    }
+    # The manifest is written last so a half-written directory is never mistaken for an artifact
+    with open(os.path.join(path, MANIFEST_FILE), "w") as file:
+        json.dump(manifest, file, indent=2)
+
+def load_artifact(path, mmap_mode="r"):
+    with open(os.path.join(path, MANIFEST_FILE)) as file:
+        manifest = json.load(file)
+    if manifest["format_version"] not in SUPPORTED_FORMAT_VERSIONS:
+        raise ValueError(f"Unsupported artifact format version {manifest['format_version']} in {path}")
+    arrays = {
+        name: np.load(os.path.join(path, filename), mmap_mode=mmap_mode, allow_pickle=False)
+        for name, filename in ARRAY_FILES.items()
+    }
+    for name in manifest.get("arrays", []):
+        arrays[name] = np.load(os.path.join(path, OPTIONAL_ARRAY_FILES[name]), mmap_mode=mmap_mode, allow_pickle=False)
+    tokenizer = Tokenizer.from_file(os.path.join(path, TOKENIZER_FILE))
+    vectorizer = TokenIdVectorizer(tokenizer, arrays["id_to_column"], arrays["idf"],
+                                   lowercase=manifest["lowercase"], norm=manifest["norm"],
+                                   column_map=arrays.get("column_map"))
+    classifier = FusedLinearClassifier(arrays["weights"], arrays["intercepts"], arrays["label_classes"],
+                                       scales=arrays.get("scales"))
+    return vectorizer, classifier, np.asarray(manifest["classes"], dtype=object)
+
+def main(argv=None):
+    from utils.load_pipeline import Pipeline
+
+    parser = argparse.ArgumentParser(description="Export a pickled pipeline to the memory-mappable artifact format.")
+    parser.add_argument("pipeline_path", help="Pickled pipeline, e.g. models/pipeline/pipeline.pkl")
+    parser.add_argument("artifact_path", help="Output directory, e.g. models/pipeline/artifact")
+    parser.add_argument("--subjects-path", default="data/processed/subjects.csv")
+    args = parser.parse_args(argv)
+
+    pipeline = Pipeline(args.pipeline_path, args.subjects_path)
+    export_artifact(pipeline.vectorizer, pipeline.classifier, pipeline.lookup.classes, args.artifact_path)
+    print(f"Exported {args.pipeline_path} to {args.artifact_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from utils.load_pipeline import Pipeline
+
+PIPELINE_PATH = "models/pipeline/pipeline.pkl"
+SUBJECTS_PATH = "data/processed/subjects.csv"
+
+# Set once per worker process by the pool initializer
+_pipeline = None
+
+def _init_worker(pipeline_path, subjects_path):
+    global _pipeline
+    _pipeline = Pipeline(pipeline_path, subjects_path)
+
+def _predict_chunk(texts):
+    return [
+        {
+            "subjects": prediction.get_subjects(),
+            "full_names": prediction.get_full_names(),
+            "supergroups": prediction.get_supergroups(),
+        }
+        for prediction in _pipeline.predict(texts)
+    ]
+
+def check_columns(path, columns, text_columns, id_column):
+    # Exits naming the columns found, instead of failing on a missing column halfway through the first chunk
+    if not any(column in columns for column in text_columns):
+        raise SystemExit(f"None of the text columns {text_columns} found in {path}, its columns are {list(columns)}")
+    if id_column and id_column not in columns:
+        raise SystemExit(f"Id column {id_column!r} not found in {path}, its columns are {list(columns)}")
+
+def read_chunks(path, text_columns, id_column=None, chunk_size=1000):
+    # Yields (ids, texts) per chunk. Ids are strings whatever their JSON type, as read from a CSV, and None
+    # where missing. The columns are checked against the header of a CSV and against the first chunk of
+    # JSON input; a JSON record may leave out any column.
+    if path.endswith(".jsonl"):
+        reader = pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False)
+    elif path.endswith(".json"):
+        # A JSON array of records can't be streamed: it is read whole, then split into chunks
+        records = pd.read_json(path, dtype=False)
+        reader = (records[start:start + chunk_size] for start in range(0, len(records), chunk_size))
+    else:
+        check_columns(path, pd.read_csv(path, nrows=0).columns, text_columns, id_column)
+        usecols = lambda column: column in text_columns or column == id_column
+        reader = pd.read_csv(path, chunksize=chunk_size, usecols=usecols, dtype=str)
+    columns = None
+    for chunk in reader:
+        if columns is None:
+            check_columns(path, chunk.columns, text_columns, id_column)
+            columns = list(dict.fromkeys([column for column in text_columns if column in chunk.columns]
+                                         + ([id_column] if id_column else [])))
+        # A JSON chunk whose records all leave out a column gets it as missing values
+        chunk = chunk.reindex(columns=columns)
+        parts = [chunk[column].fillna("").astype(str) for column in text_columns if column in columns]
+        texts = parts[0]
+        for part in parts[1:]:
+            texts = texts + " " + part
+        ids = None
+        if id_column:
+            values = chunk[id_column].astype(object)
+            ids = [None if missing else str(value) for value, missing in zip(values, values.isna())]
+        yield ids, texts.tolist()
+
+class PredictionWriter:
+    def __init__(self, file, output_format, id_column=None):
+        self.file = file
+        self.output_format = output_format
+        self.id_column = id_column
+        if output_format == "csv":
+            fields = ([id_column] if id_column else []) + ["subjects", "full_names", "supergroups"]
+            self.writer = csv.DictWriter(file, fieldnames=fields)
+            self.writer.writeheader()
+
+    def write(self, ids, results):
+        for i, result in enumerate(results):
+            record = {self.id_column: ids[i]} if self.id_column else {}
+            record.update(result)
+            if self.output_format == "csv":
+                self.writer.writerow({key: ";".join(value) if isinstance(value, list) else value for key, value in record.items()})
+            else:
+                self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def batch_predict(input_path, output_file, text_columns, id_column=None, output_format="jsonl",
+                  chunk_size=1000, workers=None, pipeline_path=PIPELINE_PATH, subjects_path=SUBJECTS_PATH,
+                  log_every=10):
+    workers = os.cpu_count() if workers is None else workers
+    writer = PredictionWriter(output_file, output_format, id_column)
+    chunks = read_chunks(input_path, text_columns, id_column, chunk_size)
+    start_time = time.perf_counter()
+    total = 0
+
+    def report(final=False):
+        elapsed = time.perf_counter() - start_time
+        rate = total / elapsed if elapsed > 0 else 0.0
+        label = "Done" if final else "Scored"
+        print(f"[{elapsed:.2f}] {label} {total} rows ({rate:.1f} rows/s)", file=sys.stderr)
+
+    if workers == 0:
+        _init_worker(pipeline_path, subjects_path)
+        for n_chunks, (ids, texts) in enumerate(chunks, start=1):
+            writer.write(ids, _predict_chunk(texts))
+            total += len(texts)
+            if n_chunks % log_every == 0:
+                report()
+        report(final=True)
+        return total
+
+    # At most 2 chunks per worker are in flight, and results are written in submission order,
+    # so memory stays bounded no matter how large the input is
+    max_in_flight = 2 * workers
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(pipeline_path, subjects_path)) as executor:
+        in_flight = deque()
+        n_chunks = 0
+        for ids, texts in chunks:
+            in_flight.append((ids, executor.submit(_predict_chunk, texts)))
+            if len(in_flight) >= max_in_flight:
+                done_ids, future = in_flight.popleft()
+                results = future.result()
+                writer.write(done_ids, results)
+                total += len(results)
+                n_chunks += 1
+                if n_chunks % log_every == 0:
+                    report()
+        while in_flight:
+            done_ids, future = in_flight.popleft()
+            results = future.result()
+            writer.write(done_ids, results)
+            total += len(results)
+    report(final=True)
+    return total
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a JSONL/JSON/CSV file of titles/abstracts with the subject classifier.")
+    parser.add_argument("input", help="Input .jsonl, .json (an array of records, read whole) or .csv file")
+    parser.add_argument("-o", "--output", help="Output file (.jsonl or .csv), defaults to stdout as JSONL")
+    parser.add_argument("--text-columns", nargs="+", default=["title", "abstract"],
+                        help="Columns joined with a space to form the text to score")
+    parser.add_argument("--id-column", default=None, help="Column copied through to the output, as strings")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes, 0 to score in the current process")
+    parser.add_argument("--pipeline-path", default=PIPELINE_PATH)
+    parser.add_argument("--subjects-path", default=SUBJECTS_PATH)
+    args = parser.parse_args(argv)
+
+    output_format = "csv" if args.output and args.output.endswith(".csv") else "jsonl"
+    output_file = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        batch_predict(
+            args.input, output_file, args.text_columns,
+            id_column=args.id_column,
+            output_format=output_format,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            pipeline_path=args.pipeline_path,
+            subjects_path=args.subjects_path,
+        )
+    finally:
+        if args.output:
+            output_file.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Only the ASCII whitespace both Python and the tokenizer's Whitespace pre-tokenizer split on
+_WHITESPACE = re.compile(r"[ \t\n\r\f\v]+")
+
+def normalize_text(text, lowercase=True):
+    # Whitespace runs never reach a token and the vectorizer lowercases anyway,
+    # so texts that only differ in those share a prediction
+    text = _WHITESPACE.sub(" ", text).strip(" ")
+    return text.lower() if lowercase else text
+
+def text_key(text, lowercase=True):
+    return hashlib.blake2b(normalize_text(text, lowercase).encode("utf-8"), digest_size=16).digest()
+
+class PredictionCache:
+    # Thread-safe LRU cache bounded by entry count and optionally by age (ttl, in seconds)
+    def __init__(self, maxsize=1024, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or expires_at > self.clock():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def count_hits(self, count):
+        # Lookups answered without calling get(), e.g. repeats of a text within one batch
+        with self.lock:
+            self.hits += count
+
+    def put(self, key, value):
+        expires_at = self.clock() + self.ttl if self.ttl is not None else None
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
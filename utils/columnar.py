@@ -0,0 +1,115 @@
+import argparse
+import os
+
+import pandas as pd
+
+# Column types of the processed tables in their Parquet form. Repeated labels become categoricals
+# (dictionary-encoded in Parquet), ids become Arrow strings instead of Python objects, dates become timestamps.
+SCHEMAS = {
+    "papers": {
+        "string": ["id", "title", "abstract"],
+        "categorical": ["publication_name"],
+        "date": ["publish_date"],
+        "integer": ["cited_by_count", "reference_count"],
+    },
+    "classification_codes": {
+        "string": ["name"],
+        "categorical": ["abbreviation"],
+        "integer": ["code"],
+    },
+    "paper_to_classification_code": {
+        "string": ["paper_id"],
+        "integer": ["code"],
+    },
+    "affiliations": {
+        "string": ["name", "href"],
+        "categorical": ["city", "country"],
+        "integer": ["id"],
+    },
+    "paper_to_affiliation": {
+        "string": ["paper_id"],
+        "integer": ["id"],
+    },
+    "keywords": {
+        "string": ["keyword"],
+    },
+    "paper_to_keyword": {
+        "string": ["id"],
+        "categorical": ["keyword"],
+    },
+    "author_pub_counts": {
+        "string": ["name"],
+        "integer": ["publication_count"],
+    },
+    "references": {
+        "string": ["paper_id", "reference_id", "full_text", "title", "text"],
+        "categorical": ["source_title"],
+    },
+    "paper_reference_author": {
+        "string": ["paper_id", "reference_id"],
+        "categorical": ["name"],
+    },
+}
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def apply_schema(df, table):
+    schema = SCHEMAS.get(table, {})
+    dtypes = {}
+    for column in schema.get("string", []):
+        dtypes[column] = "string[pyarrow]"
+    for column in schema.get("categorical", []):
+        dtypes[column] = "category"
+    for column in schema.get("integer", []):
+        dtypes[column] = "Int64"
+    df = df.astype({column: dtype for column, dtype in dtypes.items() if column in df.columns})
+    for column in schema.get("date", []):
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], errors="coerce")
+    return df
+
+def write_parquet(df, data_path, table):
+    apply_schema(df, table).to_parquet(os.path.join(data_path, f"{table}.parquet"), index=False)
+
+def convert_directory(data_path):
+    # Writes a Parquet copy next to every processed CSV that has a schema
+    converted = []
+    for table in SCHEMAS:
+        csv_path = os.path.join(data_path, f"{table}.csv")
+        if os.path.isfile(csv_path):
+            write_parquet(pd.read_csv(csv_path), data_path, table)
+            converted.append(table)
+    return converted
+
+def current_parquet_path(data_path, table):
+    # The Parquet copy of a table, or None without one or when the CSV was modified after it was written
+    # (the CSVs were prepared again without rewriting the copies, or edited by hand)
+    parquet_path = os.path.join(data_path, f"{table}.parquet")
+    if not os.path.isfile(parquet_path):
+        return None
+    csv_path = os.path.join(data_path, f"{table}.csv")
+    if os.path.isfile(csv_path) and os.path.getmtime(csv_path) > os.path.getmtime(parquet_path):
+        return None
+    return parquet_path
+
+def read_table(data_path, table, columns=None):
+    # Prefers an up to date Parquet copy, reading only the requested columns, and falls back to the CSV
+    parquet_path = current_parquet_path(data_path, table)
+    if parquet_path is not None and parquet_available():
+        return pd.read_parquet(parquet_path, columns=columns)
+    return pd.read_csv(os.path.join(data_path, f"{table}.csv"), usecols=columns)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write Parquet copies of the processed CSV tables.")
+    parser.add_argument("data_path", nargs="?", default="data/processed")
+    args = parser.parse_args(argv)
+    for table in convert_directory(args.data_path):
+        print(f"Wrote {os.path.join(args.data_path, table)}.parquet")
+
+if __name__ == "__main__":
+    main()
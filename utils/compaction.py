@@ -0,0 +1,136 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.artifact import export_artifact
+from utils.inference import FusedLinearClassifier, TokenIdVectorizer
+
+DTYPES = ("float64", "float32", "int8")
+
+def compact(vectorizer, classifier, threshold=1e-4, dtype="float32"):
+    # Drops the features whose weight is <= threshold in absolute value for every label and stores the rest
+    # as float32, or int8 with one scale per label. The vectorizer still normalizes over the full vocabulary,
+    # so the surviving features keep their exact TF-IDF values.
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype must be one of {DTYPES}")
+    weights = np.asarray(classifier.weights, dtype=np.float64)
+    if classifier.scales is not None:
+        weights = weights * classifier.scales
+    kept = np.abs(weights).max(axis=1) > threshold
+
+    kept_map = np.full(len(kept), -1, dtype=np.int32)
+    kept_map[kept] = np.arange(kept.sum(), dtype=np.int32)
+    if vectorizer.column_map is None:
+        column_map = kept_map
+    else:
+        # Compose with an earlier compaction
+        previous = np.asarray(vectorizer.column_map)
+        column_map = np.where(previous >= 0, kept_map[np.maximum(previous, 0)], -1).astype(np.int32)
+
+    weights = weights[kept]
+    scales = None
+    if dtype == "int8":
+        scales = np.abs(weights).max(axis=0) / 127
+        scales[scales == 0] = 1.0
+        weights = np.round(weights / scales).astype(np.int8)
+        scales = scales.astype(np.float32)
+    else:
+        weights = weights.astype(dtype)
+
+    compact_vectorizer = TokenIdVectorizer(vectorizer.tokenizer, vectorizer.id_to_column, vectorizer.idf,
+                                           lowercase=vectorizer.lowercase, norm=vectorizer.norm,
+                                           column_map=column_map)
+    compact_classifier = FusedLinearClassifier(np.ascontiguousarray(weights), np.asarray(classifier.intercepts),
+                                               np.asarray(classifier.classes), scales=scales)
+    return compact_vectorizer, compact_classifier
+
+def load_labeled_papers(data_path):
+    # Same texts and labels as the training notebook: title + abstract, labelled with code abbreviations
+    papers = pd.read_csv(os.path.join(data_path, "papers.csv"), usecols=["id", "title", "abstract"])
+    paper_to_classification_code = pd.read_csv(os.path.join(data_path, "paper_to_classification_code.csv"))
+    classification_codes = pd.read_csv(os.path.join(data_path, "classification_codes.csv"))
+    papers.dropna(subset=["id", "title", "abstract"], inplace=True)
+    paper_to_classification_code.dropna(inplace=True)
+    classification_codes.dropna(inplace=True)
+    joined_data = (
+        papers
+        .merge(paper_to_classification_code, left_on="id", right_on="paper_id")
+        .merge(classification_codes, on="code")
+        .groupby("id")
+        .agg({"abbreviation": lambda x: list(x), "title": "first", "abstract": "first"})
+    )
+    return (joined_data["title"] + " " + joined_data["abstract"]).tolist(), joined_data["abbreviation"].tolist()
+
+def evaluate(pipelines, texts, labels, classes):
+    from sklearn.metrics import accuracy_score, f1_score
+    from sklearn.preprocessing import MultiLabelBinarizer
+
+    y_true = MultiLabelBinarizer(classes=list(classes)).fit_transform(labels)
+    report = {}
+    predictions = {}
+    for name, (vectorizer, classifier) in pipelines.items():
+        start = time.perf_counter()
+        y_pred = classifier.predict(vectorizer.transform(texts))
+        seconds = time.perf_counter() - start
+        predictions[name] = y_pred
+        report[name] = {
+            "subset_accuracy": accuracy_score(y_true, y_pred),
+            "micro_f1": f1_score(y_true, y_pred, average="micro", zero_division=0),
+            "macro_f1": f1_score(y_true, y_pred, average="macro", zero_division=0),
+            "texts_per_s": len(texts) / seconds,
+        }
+    return report, predictions
+
+def main(argv=None):
+    from utils.load_pipeline import Pipeline
+
+    parser = argparse.ArgumentParser(description="Prune and quantize the pipeline's classifier weights into a compact artifact.")
+    parser.add_argument("pipeline_path", help="Pickled pipeline or artifact directory")
+    parser.add_argument("artifact_path", help="Output artifact directory, e.g. models/pipeline/compact")
+    parser.add_argument("--threshold", type=float, default=1e-4,
+                        help="Features with |weight| <= threshold for every label are dropped")
+    parser.add_argument("--dtype", choices=DTYPES, default="float32")
+    parser.add_argument("--subjects-path", default="data/processed/subjects.csv")
+    parser.add_argument("--data-path", default="data/processed", help="Processed data used for the held-out evaluation")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=56164)
+    parser.add_argument("--no-evaluate", action="store_true")
+    args = parser.parse_args(argv)
+
+    pipeline = Pipeline(args.pipeline_path, args.subjects_path)
+    if not isinstance(pipeline.vectorizer, TokenIdVectorizer) or not isinstance(pipeline.classifier, FusedLinearClassifier):
+        raise SystemExit("Only pipelines with a TokenIdVectorizer and a FusedLinearClassifier can be compacted")
+    vectorizer, classifier = compact(pipeline.vectorizer, pipeline.classifier, args.threshold, args.dtype)
+    export_artifact(vectorizer, classifier, pipeline.lookup.classes, args.artifact_path)
+
+    original_bytes = pipeline.classifier.weights.nbytes
+    compact_bytes = classifier.weights.nbytes + (classifier.scales.nbytes if classifier.scales is not None else 0)
+    print(f"Kept {classifier.weights.shape[0]} of {pipeline.classifier.weights.shape[0]} features "
+          f"(threshold {args.threshold}), weights {original_bytes / 1e6:.2f} MB -> {compact_bytes / 1e6:.2f} MB as {args.dtype}")
+    print(f"Exported {args.artifact_path}")
+    if args.no_evaluate:
+        return
+
+    # A seeded random split, not the notebook's iterative split, so part of it may have been seen in training.
+    # The delta between the two models is what matters here.
+    texts, labels = load_labeled_papers(args.data_path)
+    held_out = np.random.default_rng(args.seed).permutation(len(texts))[:int(len(texts) * args.test_size)]
+    texts = [texts[i] for i in held_out]
+    labels = [labels[i] for i in held_out]
+    report, predictions = evaluate(
+        {"original": (pipeline.vectorizer, pipeline.classifier), "compact": (vectorizer, classifier)},
+        texts, labels, pipeline.lookup.classes,
+    )
+    agreement = (predictions["original"] == predictions["compact"]).all(axis=1).mean()
+    print(f"Held-out papers: {len(texts)}")
+    print(f"{'':<18}{'original':>12}{'compact':>12}{'delta':>12}")
+    for metric in ("subset_accuracy", "micro_f1", "macro_f1", "texts_per_s"):
+        original, compacted = report["original"][metric], report["compact"][metric]
+        print(f"{metric:<18}{original:>12.4f}{compacted:>12.4f}{compacted - original:>+12.4f}")
+    print(f"Papers with identical predicted labels: {agreement:.2%}")
+
+if __name__ == "__main__":
+    main()
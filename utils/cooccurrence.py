@@ -0,0 +1,125 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from utils.columnar import read_table
+from utils.encoding import ENCODED_FOLDER, build_keys, encode_column, is_encoded, load_encoded
+
+class KeywordCooccurrence:
+    # Keyword co-occurrence counts (the number of papers having both keywords) over any year range.
+    # Built from one (paper key, keyword key) pair per paper_to_keyword row and the year of every paper
+    # key (NaN without one). The papers x keywords incidence matrix is kept as CSR with its rows sorted
+    # by year, so the papers of a year range are one contiguous slice of rows; papers without a year are
+    # left out. The counts are the sparse product of the slice with itself, computed only over keywords
+    # that could reach min_count: a pair never occurs in more papers than either of its keywords.
+    def __init__(self, key_year, paper_keys, keyword_keys, keyword_names):
+        dated = ~np.isnan(key_year[paper_keys])
+        paper_keys, keyword_keys = paper_keys[dated], keyword_keys[dated]
+        years = key_year[paper_keys].astype(np.int64)
+        # Rows ordered by (year, paper); repeated (paper, keyword) pairs count once
+        order = np.lexsort((keyword_keys, paper_keys, years))
+        paper_keys, keyword_keys, years = paper_keys[order], keyword_keys[order], years[order]
+        keep = np.ones(len(order), dtype=bool)
+        keep[1:] = (paper_keys[1:] != paper_keys[:-1]) | (keyword_keys[1:] != keyword_keys[:-1])
+        paper_keys, keyword_keys, years = paper_keys[keep], keyword_keys[keep], years[keep]
+        new_paper = np.ones(len(paper_keys), dtype=bool)
+        new_paper[1:] = paper_keys[1:] != paper_keys[:-1]
+        rows = np.cumsum(new_paper) - 1
+
+        self.keyword_names = np.asarray(keyword_names, dtype=object)
+        self.row_years = years[new_paper]
+        indptr = np.zeros(len(self.row_years) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(self.row_years)), out=indptr[1:])
+        self.incidence = sp.csr_matrix((np.ones(len(keyword_keys), dtype=np.int32), keyword_keys.astype(np.int32), indptr),
+                                       shape=(len(self.row_years), len(self.keyword_names)))
+
+    def year_bounds(self):
+        return int(self.row_years[0]), int(self.row_years[-1])
+
+    def papers(self, year_range):
+        # Incidence rows of the papers published in the year range
+        start = np.searchsorted(self.row_years, year_range[0], side="left")
+        stop = np.searchsorted(self.row_years, year_range[1], side="right")
+        return self.incidence[start:stop]
+
+    def keyword_counts(self, year_range):
+        return np.bincount(self.papers(year_range).indices, minlength=len(self.keyword_names))
+
+    def pairs(self, year_range, min_count=2):
+        # Keyword pairs found together in at least min_count papers of the year range, as
+        # (source keys, target keys, counts) with source < target, most frequent first, ties by keys
+        incidence = self.papers(year_range)
+        candidates = np.flatnonzero(np.bincount(incidence.indices, minlength=len(self.keyword_names)) >= min_count)
+        pruned = incidence[:, candidates]
+        counts = sp.triu(pruned.T @ pruned, k=1, format="coo")
+        frequent = counts.data >= min_count
+        sources, targets, counts = candidates[counts.row[frequent]], candidates[counts.col[frequent]], counts.data[frequent]
+        order = np.lexsort((targets, sources, -counts))
+        return sources[order], targets[order], counts[order].astype(np.int64)
+
+    def top_subgraph(self, year_range, top_n=50, min_count=2):
+        # The top_n keywords with the most co-occurrences (summed over their pairs), ties by keyword, and
+        # the pairs among them, as (nodes, edges) DataFrames small enough to lay out with networkx
+        sources, targets, counts = self.pairs(year_range, min_count)
+        strength = (np.bincount(sources, weights=counts, minlength=len(self.keyword_names))
+                    + np.bincount(targets, weights=counts, minlength=len(self.keyword_names)))
+        linked = np.flatnonzero(strength)
+        top = linked[np.lexsort((self.keyword_names[linked], -strength[linked]))[:top_n]]
+        in_top = np.zeros(len(self.keyword_names), dtype=bool)
+        in_top[top] = True
+        kept = in_top[sources] & in_top[targets]
+        nodes = pd.DataFrame({
+            "keyword": self.keyword_names[top],
+            "papers": self.keyword_counts(year_range)[top],
+            "cooccurrences": strength[top].astype(np.int64),
+        })
+        edges = pd.DataFrame({
+            "source": self.keyword_names[sources[kept]],
+            "target": self.keyword_names[targets[kept]],
+            "papers": counts[kept],
+        })
+        return nodes, edges
+
+def load_keyword_cooccurrence(data_path):
+    # From the encoded link arrays when they exist (see utils.encoding), otherwise from paper_to_keyword
+    papers_df = read_table(data_path, "papers", ["id", "publish_date"])
+    encoded_path = os.path.join(data_path, ENCODED_FOLDER)
+    if is_encoded(encoded_path):
+        encoded = load_encoded(encoded_path)
+        paper_ids, keyword_names = encoded.keys["papers"], encoded.keys["keywords"]
+        links = np.asarray(encoded.links["paper_to_keyword"])
+    else:
+        links_df = read_table(data_path, "paper_to_keyword", ["id", "keyword"])
+        paper_ids, keyword_names = build_keys(papers_df["id"]), build_keys(links_df["keyword"])
+        links = np.column_stack([encode_column(paper_ids, links_df["id"]), encode_column(keyword_names, links_df["keyword"])])
+        links = links[(links >= 0).all(axis=1)]
+    years = pd.Series(pd.to_datetime(papers_df["publish_date"], errors="coerce").dt.year.to_numpy(np.float64),
+                      index=papers_df["id"].to_numpy())
+    key_year = years[~years.index.duplicated()].reindex(paper_ids).to_numpy(np.float64)
+    return KeywordCooccurrence(key_year, links[:, 0], links[:, 1], keyword_names.to_numpy(dtype=object))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print the most frequent keyword co-occurrences.")
+    parser.add_argument("data_path", nargs="?", default="data/processed")
+    parser.add_argument("--years", nargs=2, type=int, metavar=("FIRST", "LAST"))
+    parser.add_argument("--min-count", type=int, default=2)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    cooccurrence = load_keyword_cooccurrence(args.data_path)
+    print(f"Loaded {cooccurrence.incidence.shape[0]} papers x {cooccurrence.incidence.shape[1]} keywords "
+          f"in {time.perf_counter() - start:.2f} s")
+    year_range = args.years or cooccurrence.year_bounds()
+    start = time.perf_counter()
+    sources, targets, counts = cooccurrence.pairs(year_range, args.min_count)
+    print(f"{len(counts)} pairs in at least {args.min_count} papers of {year_range[0]}-{year_range[1]} "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+    for source, target, count in zip(sources[:args.top], targets[:args.top], counts[:args.top]):
+        print(f"  {count:6d}  {cooccurrence.keyword_names[source]} / {cooccurrence.keyword_names[target]}")
+
+if __name__ == "__main__":
+    main()
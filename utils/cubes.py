@@ -0,0 +1,191 @@
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from utils.filter_index import build_filter_index
+
+def group_code_counts(abbreviations, names, counts):
+    # Count and the full names behind each abbreviation, one name per counted paper-code link.
+    # Takes one entry per classification code, in key order.
+    frame = pd.DataFrame({
+        "display_name": abbreviations,
+        "count": counts,
+        "full_name_list": [[name] * count for name, count in zip(names, counts)],
+    }).dropna(subset=["display_name"])
+    return frame.groupby("display_name", sort=True).agg(
+        count=("count", "sum"),
+        full_name_list=("full_name_list", lambda lists: [name for names in lists for name in names]),
+    ).reset_index()
+
+def group_code_trends(years, abbreviations, counts):
+    frame = pd.DataFrame({"year": years, "display_name": abbreviations, "count": counts})
+    return frame.groupby(["year", "display_name"], sort=True)["count"].sum().reset_index()
+
+def top_keywords(keywords, counts, limit):
+    # The limit most frequent keywords as {keyword: count}, most frequent first, ties by keyword
+    frame = pd.DataFrame({"keyword": keywords, "count": counts})
+    frame = frame.sort_values(["count", "keyword"], ascending=[False, True]).head(limit)
+    return dict(zip(frame["keyword"], frame["count"].tolist()))
+
+class YearCube:
+    # Counts per (year, label), sorted by year so a year range is one contiguous slice of the arrays.
+    # Built from one row per counted item; rows with a missing year or label are not counted.
+    # The paper key, year and label of every counted row are kept too, to count the rows of any set of
+    # papers given as a boolean mask over the paper keys (see utils.filter_index).
+    def __init__(self, years, labels, papers):
+        frame = pd.DataFrame({"year": np.asarray(years), "label": labels, "paper": np.asarray(papers)}).dropna()
+        codes, uniques = pd.factorize(frame["label"], sort=True)
+        row_years = frame["year"].to_numpy(np.int64)
+        counts = pd.DataFrame({"year": row_years, "code": codes}).value_counts(sort=False).sort_index()
+        self.labels = np.asarray(uniques, dtype=object)
+        self.years = counts.index.get_level_values("year").to_numpy(np.int64)
+        self.codes = counts.index.get_level_values("code").to_numpy(np.int64)
+        self.counts = counts.to_numpy(np.int64)
+
+        self.row_papers = frame["paper"].to_numpy(np.int64)
+        self.row_codes = codes.astype(np.int64)
+        self.year_values, self.row_year_index = np.unique(row_years, return_inverse=True)
+
+    def bounds(self, year_range):
+        return (np.searchsorted(self.years, year_range[0], side="left"),
+                np.searchsorted(self.years, year_range[1], side="right"))
+
+    def total(self, year_range, paper_mask=None):
+        # Count per label over the year range, labels without any count left out, in label order.
+        # With a paper mask only the rows of the masked papers are counted; the mask holds the year range.
+        if paper_mask is None:
+            start, stop = self.bounds(year_range)
+            totals = np.bincount(self.codes[start:stop], weights=self.counts[start:stop], minlength=len(self.labels))
+        else:
+            totals = np.bincount(self.row_codes[paper_mask[self.row_papers]], minlength=len(self.labels))
+        present = np.flatnonzero(totals)
+        return pd.Series(totals[present].astype(np.int64), index=pd.Index(self.labels[present], name="label"), name="count")
+
+    def by_year(self, year_range, paper_mask=None):
+        # One row per (year, label) with a count in the year range, ordered by year then label
+        if paper_mask is None:
+            start, stop = self.bounds(year_range)
+            years, codes, counts = self.years[start:stop], self.codes[start:stop], self.counts[start:stop]
+        else:
+            selected = paper_mask[self.row_papers]
+            cells = self.row_year_index[selected] * len(self.labels) + self.row_codes[selected]
+            counts = np.bincount(cells, minlength=len(self.year_values) * len(self.labels))
+            present = np.flatnonzero(counts)
+            years = self.year_values[present // len(self.labels)]
+            codes, counts = present % len(self.labels), counts[present]
+        return pd.DataFrame({"year": years, "label": self.labels[codes], "count": counts.astype(np.int64)})
+
+class DashboardCubes:
+    # Per-year counts behind the dashboard charts, built from the processed tables and their
+    # integer-encoded links (see utils.encoding), so building them only gathers and counts int32 keys.
+    # Each cube is built by the first query that needs it, which loads its other tables through
+    # load_table(name); a session that never opens a chart never loads its tables.
+    # A paper belongs to the year of its publish_date; papers without one are never in a year range.
+    # Every query also takes filters (see utils.filter_index.FilterIndex); with any, it counts the rows
+    # of the papers they select instead.
+    supports_filters = True
+
+    def __init__(self, papers_df, load_table, encoded):
+        self.papers = papers_df[papers_df["publish_date"].notnull()]
+        self.paper_years = self.papers["publish_date"].dt.year.astype(np.int64)
+        self.load_table = load_table
+        self.encoded = encoded
+
+        papers_per_year = self.paper_years.value_counts().sort_index()
+        self.years = papers_per_year.index.to_numpy(np.int64)
+        self.papers_per_year = papers_per_year.to_numpy(np.int64)
+
+    @cached_property
+    def key_year(self):
+        # Year of every paper key, NaN for papers without a date
+        key_year = pd.Series(self.paper_years.to_numpy(), index=self.papers["id"].to_numpy())
+        return key_year[~key_year.index.duplicated()].reindex(self.encoded.keys["papers"]).to_numpy(np.float64)
+
+    @cached_property
+    def paper_keys(self):
+        # Paper key of every dated papers row
+        return self.encoded.keys["papers"].get_indexer(self.papers["id"].to_numpy())
+
+    @cached_property
+    def journals(self):
+        return YearCube(self.paper_years, self.papers["publication_name"], self.paper_keys)
+
+    @cached_property
+    def code_attributes(self):
+        # Abbreviation and name of every code key; a repeated code id keeps its first row
+        codes_df = (self.load_table("classification_codes").drop_duplicates("code").set_index("code")
+                    .reindex(self.encoded.keys["classification_codes"]))
+        return codes_df["abbreviation"].to_numpy(dtype=object), codes_df["name"].to_numpy(dtype=object)
+
+    @cached_property
+    def codes(self):
+        links = self.encoded.links["paper_to_classification_code"]
+        return YearCube(self.key_year[links[:, 0]], links[:, 1], links[:, 0])
+
+    @cached_property
+    def key_country(self):
+        # Country of every affiliation key; a repeated affiliation id keeps its first row
+        return (self.load_table("affiliations").drop_duplicates("id").set_index("id")["country"]
+                .reindex(self.encoded.keys["affiliations"]).to_numpy(dtype=object))
+
+    @cached_property
+    def countries(self):
+        links = self.encoded.links["paper_to_affiliation"]
+        return YearCube(self.key_year[links[:, 0]], self.key_country[links[:, 1]], links[:, 0])
+
+    @cached_property
+    def keywords(self):
+        links = self.encoded.links["paper_to_keyword"]
+        return YearCube(self.key_year[links[:, 0]], links[:, 1], links[:, 0])
+
+    @cached_property
+    def filter_index(self):
+        abbreviations, _ = self.code_attributes
+        return build_filter_index(self.key_year, self.encoded.links, abbreviations, self.key_country,
+                                  self.encoded.keys["keywords"].to_numpy(dtype=object))
+
+    def paper_mask(self, year_range, filters):
+        # None without filters, the queries then sum the precomputed counts of the year range
+        return self.filter_index.mask(year_range, filters) if filters else None
+
+    def year_bounds(self, year_range):
+        return (np.searchsorted(self.years, year_range[0], side="left"),
+                np.searchsorted(self.years, year_range[1], side="right"))
+
+    def paper_count(self, year_range, filters=()):
+        mask = self.paper_mask(year_range, filters)
+        if mask is not None:
+            return int(mask[self.paper_keys].sum())
+        start, stop = self.year_bounds(year_range)
+        return int(self.papers_per_year[start:stop].sum())
+
+    def publications_per_year(self, year_range, filters=()):
+        mask = self.paper_mask(year_range, filters)
+        if mask is not None:
+            counts = self.paper_years[mask[self.paper_keys]].value_counts().sort_index()
+            return pd.DataFrame({"publish_date": counts.index.to_numpy(np.int64), "count": counts.to_numpy(np.int64)})
+        start, stop = self.year_bounds(year_range)
+        return pd.DataFrame({"publish_date": self.years[start:stop], "count": self.papers_per_year[start:stop]})
+
+    def journal_counts(self, year_range, filters=()):
+        return self.journals.total(year_range, self.paper_mask(year_range, filters))
+
+    def classification_code_counts(self, year_range, filters=()):
+        abbreviations, names = self.code_attributes
+        totals = self.codes.total(year_range, self.paper_mask(year_range, filters))
+        rows = totals.index.to_numpy(np.int64)
+        return group_code_counts(abbreviations[rows], names[rows], totals.to_numpy())
+
+    def classification_code_trends(self, year_range, filters=()):
+        abbreviations, _ = self.code_attributes
+        trends = self.codes.by_year(year_range, self.paper_mask(year_range, filters))
+        return group_code_trends(trends["year"], abbreviations[trends["label"].to_numpy(np.int64)], trends["count"])
+
+    def country_counts(self, year_range, filters=()):
+        return self.countries.total(year_range, self.paper_mask(year_range, filters))
+
+    def keyword_frequencies(self, year_range, limit, filters=()):
+        keyword_names = self.encoded.keys["keywords"].to_numpy(dtype=object)
+        totals = self.keywords.total(year_range, self.paper_mask(year_range, filters))
+        return top_keywords(keyword_names[totals.index.to_numpy(np.int64)], totals.to_numpy(), limit)
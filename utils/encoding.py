@@ -0,0 +1,133 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.columnar import read_table
+
+# Dense int32 surrogate keys for the ids the processed tables are joined on.
+# Key tables map a key to its original id (key i is row i), link tables are (n, 2) int32 arrays of keys.
+# An encoded directory holds {name}_keys.csv for every key table and {name}.npy for every link table;
+# the link arrays are memory-mapped on load.
+ENCODED_FOLDER = "encoded"
+KEY_TABLES = {
+    "papers": ("id", str),
+    "affiliations": ("id", "int64"),
+    "classification_codes": ("code", "int64"),
+    "keywords": ("keyword", str),
+}
+# Link table -> its (column, key table) pairs
+LINK_TABLES = {
+    "paper_to_classification_code": (("paper_id", "papers"), ("code", "classification_codes")),
+    "paper_to_affiliation": (("paper_id", "papers"), ("id", "affiliations")),
+    "paper_to_keyword": (("id", "papers"), ("keyword", "keywords")),
+}
+# Key tables that take their ids from a link table instead of a table of their own
+LINKED_KEY_TABLES = {"keywords": ("paper_to_keyword", "keyword")}
+
+class EncodedTables:
+    def __init__(self, keys, links):
+        self.keys = keys
+        self.links = links
+
+    def key_count(self, name):
+        return len(self.keys[name])
+
+class LazyTables(dict):
+    # name -> table, each loaded by load(name) on its first lookup
+    def __init__(self, load):
+        super().__init__()
+        self.load = load
+
+    def __missing__(self, name):
+        table = self[name] = self.load(name)
+        return table
+
+def build_keys(ids):
+    # Ids in first-appearance order; repeated ids keep the key of their first row
+    return pd.Index(pd.Series(ids).dropna().drop_duplicates().to_numpy())
+
+def encode_column(keys, values):
+    return keys.get_indexer(pd.Series(values).to_numpy()).astype(np.int32)
+
+def table_keys(tables, name):
+    column, _ = KEY_TABLES[name]
+    table, column = LINKED_KEY_TABLES.get(name, (name, column))
+    return build_keys(tables[table][column])
+
+def encode_links(keys, table, name):
+    # Link rows whose ids have no key (e.g. a code missing from classification_codes) are dropped,
+    # as the inner merges on the string ids dropped them.
+    encoded = np.column_stack([encode_column(keys[key_table], table[column]) for column, key_table in LINK_TABLES[name]])
+    return np.ascontiguousarray(encoded[(encoded >= 0).all(axis=1)])
+
+def encode_tables(tables):
+    # tables: name -> DataFrame for every key table without a LINKED_KEY_TABLES entry and every link table
+    keys = {name: table_keys(tables, name) for name in KEY_TABLES}
+    links = {name: encode_links(keys, tables[name], name) for name in LINK_TABLES}
+    return EncodedTables(keys, links)
+
+def encode_lazily(load_table):
+    # Like encode_tables over the tables of load_table(name), but each key table is built and each link
+    # table encoded on its first lookup, so only the tables a caller needs are read. A link table is
+    # dropped once encoded.
+    tables = LazyTables(load_table)
+    keys = LazyTables(lambda name: table_keys(tables, name))
+
+    def load_links(name):
+        links = encode_links(keys, tables[name], name)
+        tables.pop(name, None)
+        return links
+
+    return EncodedTables(keys, LazyTables(load_links))
+
+def is_encoded(path):
+    return all(os.path.isfile(os.path.join(path, f"{name}.npy")) for name in LINK_TABLES)
+
+def save_encoded(encoded, path):
+    os.makedirs(path, exist_ok=True)
+    for name, (column, _) in KEY_TABLES.items():
+        pd.DataFrame({column: encoded.keys[name]}).to_csv(os.path.join(path, f"{name}_keys.csv"), index=False)
+    # The link arrays are written last, is_encoded() only checks for them
+    for name in LINK_TABLES:
+        np.save(os.path.join(path, f"{name}.npy"), encoded.links[name], allow_pickle=False)
+
+def load_keys(path, name):
+    column, dtype = KEY_TABLES[name]
+    # Read as text without NA parsing so ids like "NA" or "1e5" come back unchanged
+    ids = pd.read_csv(os.path.join(path, f"{name}_keys.csv"), dtype=str, na_filter=False)[column]
+    return pd.Index(ids.to_numpy() if dtype is str else ids.astype(dtype).to_numpy())
+
+def load_encoded(path, mmap_mode="r"):
+    # Key tables are read when first looked up, so only the ones a caller needs are loaded
+    keys = LazyTables(lambda name: load_keys(path, name))
+    links = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+        for name in LINK_TABLES
+    }
+    return EncodedTables(keys, links)
+
+def encode_directory(data_path):
+    tables = {}
+    for name, columns in LINK_TABLES.items():
+        tables[name] = read_table(data_path, name, [column for column, _ in columns])
+    for name, (column, _) in KEY_TABLES.items():
+        if name not in LINKED_KEY_TABLES:
+            tables[name] = read_table(data_path, name, [column])
+    encoded = encode_tables(tables)
+    save_encoded(encoded, os.path.join(data_path, ENCODED_FOLDER))
+    return encoded
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Encode the ids of the processed tables as dense int32 keys.")
+    parser.add_argument("data_path", nargs="?", default="data/processed")
+    args = parser.parse_args(argv)
+    encoded = encode_directory(args.data_path)
+    for name in KEY_TABLES:
+        print(f"{name}: {encoded.key_count(name)} keys")
+    for name, links in encoded.links.items():
+        print(f"{name}: {len(links)} links")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+# Dimensions the dashboard can be filtered by besides the year range, with their sidebar labels
+FILTER_DIMENSIONS = {
+    "classification_code": "Classification code",
+    "country": "Country",
+    "keyword": "Keyword",
+}
+
+class PostingLists:
+    # Sorted paper keys per value: the papers of value v are papers[offsets[v]:offsets[v + 1]].
+    # Values are numbered in sorted label order, so a range of labels is one contiguous slice of papers.
+    def __init__(self, paper_keys, labels):
+        # One (paper key, label) pair per row; rows without a label are left out, repeated pairs kept once
+        values, uniques = pd.factorize(pd.Series(labels), sort=True)
+        paper_keys = np.asarray(paper_keys, dtype=np.int32)[values >= 0]
+        values = values[values >= 0]
+        order = np.lexsort((paper_keys, values))
+        paper_keys, values = paper_keys[order], values[order]
+        keep = np.ones(len(values), dtype=bool)
+        keep[1:] = (values[1:] != values[:-1]) | (paper_keys[1:] != paper_keys[:-1])
+        self.labels = np.asarray(uniques)
+        self.lookup = pd.Index(self.labels)
+        self.papers = np.ascontiguousarray(paper_keys[keep])
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(values[keep], minlength=len(self.labels)))])
+
+    def paper_counts(self):
+        return np.diff(self.offsets)
+
+    def range_mask(self, low, high, paper_count):
+        # Papers with a label in [low, high]
+        start = np.searchsorted(self.labels, low, side="left")
+        stop = np.searchsorted(self.labels, high, side="right")
+        mask = np.zeros(paper_count, dtype=bool)
+        mask[self.papers[self.offsets[start]:self.offsets[stop]]] = True
+        return mask
+
+    def mask(self, labels, paper_count, match_all=False):
+        # Papers with any (or all) of the labels; an unknown label matches no paper
+        values = self.lookup.get_indexer(list(labels))
+        known = values[values >= 0]
+        papers = np.concatenate([self.papers[self.offsets[value]:self.offsets[value + 1]] for value in known] or [self.papers[:0]])
+        if not match_all:
+            mask = np.zeros(paper_count, dtype=bool)
+            mask[papers] = True
+            return mask
+        if len(known) < len(values):
+            return np.zeros(paper_count, dtype=bool)
+        return np.bincount(papers, minlength=paper_count) == len(known)
+
+class FilterIndex:
+    # Posting lists over the paper keys of utils.encoding for the year and every FILTER_DIMENSIONS entry.
+    # Filters are a tuple of (dimension, match, labels) with match "any" or "all": values of one
+    # dimension are OR-ed (or AND-ed), dimensions are AND-ed with each other and the year range.
+    def __init__(self, paper_count, years, dimensions):
+        self.paper_count = paper_count
+        self.years = years
+        self.dimensions = dimensions
+
+    def options(self, dimension, limit=None):
+        # Labels of a dimension, most papers first, ties by label
+        postings = self.dimensions[dimension]
+        order = np.lexsort((postings.labels, -postings.paper_counts()))
+        return postings.labels[order[:limit]].tolist()
+
+    def mask(self, year_range, filters=()):
+        mask = self.years.range_mask(year_range[0], year_range[1], self.paper_count)
+        for dimension, match, labels in filters:
+            mask &= self.dimensions[dimension].mask(labels, self.paper_count, match_all=match == "all")
+        return mask
+
+def build_filter_index(key_year, links, code_abbreviations, key_country, keyword_names):
+    # key_year: year of every paper key (NaN without one); code_abbreviations, key_country and keyword_names:
+    # the label of every classification code, affiliation and keyword key; links: the encoded link arrays
+    paper_count = len(key_year)
+    dated = np.flatnonzero(~np.isnan(key_year))
+    years = PostingLists(dated, key_year[dated].astype(np.int64))
+    code_links = links["paper_to_classification_code"]
+    affiliation_links = links["paper_to_affiliation"]
+    keyword_links = links["paper_to_keyword"]
+    dimensions = {
+        "classification_code": PostingLists(code_links[:, 0], code_abbreviations[code_links[:, 1]]),
+        "country": PostingLists(affiliation_links[:, 0], key_country[affiliation_links[:, 1]]),
+        "keyword": PostingLists(keyword_links[:, 0], keyword_names[keyword_links[:, 1]]),
+    }
+    return FilterIndex(paper_count, years, dimensions)
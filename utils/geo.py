@@ -0,0 +1,101 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Country names used in the affiliations data -> the name of that country in countries.geo.json
+NAME_ALIASES = {
+    "Russian Federation": "Russia",
+    "United States": "United States of America",
+    "Viet Nam": "Vietnam",
+    "North Macedonia": "Macedonia",
+    "Democratic Republic Congo": "Democratic Republic of the Congo",
+    "Congo": "Republic of the Congo",
+    "Cote d'Ivoire": "Ivory Coast",
+    "Brunei Darussalam": "Brunei",
+    "Czechia": "Czech Republic",
+    "Syrian Arab Republic": "Syria",
+    "Eswatini": "Swaziland",
+    "Serbia": "Republic of Serbia",
+    "Tanzania": "United Republic of Tanzania",
+    "Guinea-Bissau": "Guinea Bissau",
+    "Timor-Leste": "East Timor",
+}
+
+def ring_area_centroid(ring):
+    # Shoelace formula; the area is unsigned so the winding order of the file doesn't matter
+    xy = np.asarray(ring, dtype=np.float64)[:, :2]
+    x, y = xy[:, 0], xy[:, 1]
+    x_next, y_next = np.roll(x, -1), np.roll(y, -1)
+    cross = x * y_next - x_next * y
+    signed_area = cross.sum() / 2
+    if signed_area == 0:
+        return 0.0, x.mean(), y.mean()
+    return (abs(signed_area),
+            ((x + x_next) * cross).sum() / (6 * signed_area),
+            ((y + y_next) * cross).sum() / (6 * signed_area))
+
+def geometry_centroid(geometry):
+    # Area-weighted centroid of all polygons, holes subtracted; None for other geometry types
+    if geometry["type"] == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif geometry["type"] == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    else:
+        return None
+    weights, lons, lats = [], [], []
+    for polygon in polygons:
+        for i, ring in enumerate(polygon):
+            area, lon, lat = ring_area_centroid(ring)
+            weights.append(area if i == 0 else -area)
+            lons.append(lon)
+            lats.append(lat)
+    weights, lons, lats = np.array(weights), np.array(lons), np.array(lats)
+    if weights.sum() <= 0:
+        outer = np.concatenate([np.asarray(polygon[0], dtype=np.float64)[:, :2] for polygon in polygons])
+        return outer[:, 0].mean(), outer[:, 1].mean()
+    # Countries split by the antimeridian (Russia, Fiji) are averaged with their western parts moved east
+    outer_lons = lons[weights > 0]
+    if outer_lons.max() - outer_lons.min() > 180:
+        lons = np.where(lons < 0, lons + 360, lons)
+    lon = np.dot(weights, lons) / weights.sum()
+    return float((lon + 180) % 360 - 180), float(np.dot(weights, lats) / weights.sum())
+
+def build_centroids(geojson_path):
+    # One row per name a country is looked up by: its GeoJSON name and every alias of it
+    with open(geojson_path) as file:
+        features = json.load(file)["features"]
+    rows = []
+    for feature in features:
+        name = feature["properties"].get("name")
+        centroid = geometry_centroid(feature["geometry"]) if name else None
+        if centroid is not None:
+            rows.append({"country": name, "name": name, "lon": centroid[0], "lat": centroid[1]})
+    centroids = pd.DataFrame(rows, columns=["country", "name", "lon", "lat"]).drop_duplicates("country")
+    by_name = centroids.set_index("name")
+    aliases = pd.DataFrame(
+        [{"country": alias, "name": name} for alias, name in NAME_ALIASES.items() if name in by_name.index],
+        columns=["country", "name"],
+    )
+    aliases = aliases.join(by_name[["lon", "lat"]], on="name")
+    return pd.concat([centroids, aliases], ignore_index=True)
+
+def load_centroids(centroids_path, geojson_path):
+    # The precomputed table when it exists, otherwise computed from the GeoJSON
+    if os.path.isfile(centroids_path):
+        return pd.read_csv(centroids_path, keep_default_na=False, na_values=[""])
+    return build_centroids(geojson_path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute the country centroid table for the affiliations map.")
+    parser.add_argument("geojson_path", nargs="?", default="notebooks/data_visualization/countries.geo.json")
+    parser.add_argument("centroids_path", nargs="?", default="notebooks/data_visualization/country_centroids.csv")
+    args = parser.parse_args(argv)
+    centroids = build_centroids(args.geojson_path)
+    centroids.to_csv(args.centroids_path, index=False, float_format="%.6f")
+    print(f"Wrote {len(centroids)} rows to {args.centroids_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+import argparse
+import json
+import os
+import time
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from utils.columnar import read_table
+
+# The citation graph of references.csv and the co-author graph of paper_reference_author.csv as CSR
+# adjacency arrays over dense int32 node ids. Citation nodes are works: the papers of the papers table
+# and every referenced work, keyed by their Scopus id (a paper's eid without the "2-s2.0-" prefix), in
+# sorted id order. An edge goes from a citing paper to the cited work. Co-author nodes are the author
+# names of the referenced works; two authors are linked when they share a work, weighted by the number
+# of works they share.
+# A graph directory holds a manifest and flat .npy arrays that are memory-mapped on load. Ids and names
+# are stored as ASCII and UTF-8 bytes.
+GRAPH_FOLDER = "graph"
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+EID_PREFIX = "2-s2.0-"
+ARRAY_FILES = {
+    "work_ids": "work_ids.npy",
+    "is_paper": "is_paper.npy",
+    "cites_indptr": "cites_indptr.npy",
+    "cites_indices": "cites_indices.npy",
+    "cited_by_indptr": "cited_by_indptr.npy",
+    "cited_by_indices": "cited_by_indices.npy",
+    "author_names": "author_names.npy",
+    "author_works": "author_works.npy",
+    "coauthor_indptr": "coauthor_indptr.npy",
+    "coauthor_indices": "coauthor_indices.npy",
+    "coauthor_weights": "coauthor_weights.npy",
+}
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOLERANCE = 1e-8
+PAGERANK_MAX_ITERATIONS = 100
+
+def scopus_ids(eids):
+    return pd.Series(eids, dtype=object).astype(str).str.removeprefix(EID_PREFIX).to_numpy(dtype=object)
+
+class Adjacency:
+    # The neighbours of node v are indices[indptr[v]:indptr[v + 1]], sorted, with their weights if any
+    def __init__(self, indptr, indices, weights=None):
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+        self.node_count = len(indptr) - 1
+
+    @classmethod
+    def from_edges(cls, sources, targets, node_count, weights=None):
+        order = np.lexsort((targets, sources))
+        indptr = np.zeros(node_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=node_count), out=indptr[1:])
+        return cls(indptr, targets[order].astype(np.int32), None if weights is None else weights[order])
+
+    def transpose(self):
+        sources = np.repeat(np.arange(self.node_count, dtype=np.int32), self.degrees())
+        return Adjacency.from_edges(self.indices, sources, self.node_count, self.weights)
+
+    def degrees(self):
+        return np.diff(self.indptr)
+
+    def neighbours(self, node):
+        start, stop = self.indptr[node], self.indptr[node + 1]
+        return self.indices[start:stop], None if self.weights is None else self.weights[start:stop]
+
+    def gather(self, nodes):
+        # The neighbours of all the nodes, concatenated
+        starts, stops = self.indptr[nodes], self.indptr[nodes + 1]
+        lengths = stops - starts
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        return self.indices[np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])]
+
+    def matrix(self):
+        weights = np.ones(len(self.indices)) if self.weights is None else self.weights
+        return sp.csr_matrix((weights, self.indices, self.indptr), shape=(self.node_count, self.node_count))
+
+def k_hop(adjacencies, sources, hops):
+    # Nodes within hops steps of the sources along any of the adjacencies, as (nodes, hop counts)
+    # ordered by node; the sources are at hop 0. One frontier of nodes is expanded per step.
+    node_count = adjacencies[0].node_count
+    distances = np.full(node_count, -1, dtype=np.int32)
+    frontier = np.unique(np.asarray(sources, dtype=np.int64))
+    distances[frontier] = 0
+    for hop in range(1, hops + 1):
+        reached = np.concatenate([adjacency.gather(frontier) for adjacency in adjacencies])
+        frontier = np.unique(reached[distances[reached] < 0])
+        if not len(frontier):
+            break
+        distances[frontier] = hop
+    nodes = np.flatnonzero(distances >= 0)
+    return nodes, distances[nodes]
+
+def pagerank(adjacency, damping=PAGERANK_DAMPING, tolerance=PAGERANK_TOLERANCE, max_iterations=PAGERANK_MAX_ITERATIONS):
+    # Power iteration over the sparse transition matrix; the rank of nodes without out-links is spread
+    # evenly over all nodes. Scores sum to 1.
+    node_count = adjacency.node_count
+    if not node_count:
+        return np.zeros(0)
+    out_degrees = adjacency.degrees().astype(np.float64)
+    dangling = out_degrees == 0
+    inverse_degrees = np.divide(1.0, out_degrees, out=np.zeros(node_count), where=~dangling)
+    transposed = adjacency.matrix().T.tocsr()
+    ranks = np.full(node_count, 1.0 / node_count)
+    for _ in range(max_iterations):
+        spread = damping * (transposed @ (ranks * inverse_degrees))
+        updated = spread + (1 - damping + damping * ranks[dangling].sum()) / node_count
+        converged = np.abs(updated - ranks).sum() < tolerance
+        ranks = updated
+        if converged:
+            break
+    return ranks
+
+class GraphStore:
+    def __init__(self, arrays):
+        self.work_ids = arrays["work_ids"]
+        self.is_paper = arrays["is_paper"]
+        self.cites = Adjacency(arrays["cites_indptr"], arrays["cites_indices"])
+        self.cited_by = Adjacency(arrays["cited_by_indptr"], arrays["cited_by_indices"])
+        self.author_names = arrays["author_names"]
+        self.author_works = arrays["author_works"]
+        self.coauthors = Adjacency(arrays["coauthor_indptr"], arrays["coauthor_indices"], arrays["coauthor_weights"])
+
+    @classmethod
+    def build(cls, paper_ids, citations, authorships):
+        # paper_ids: the eids of the papers table; citations: (citing eid, cited Scopus id) pairs;
+        # authorships: (cited Scopus id, author name) pairs. Repeated pairs and self-citations count once.
+        citing, cited, papers = scopus_ids(citations[0]), scopus_ids(citations[1]), scopus_ids(paper_ids)
+        work_ids = pd.Index(np.unique(np.concatenate([papers, citing, cited]).astype(str)))
+        sources, targets = work_ids.get_indexer(citing), work_ids.get_indexer(cited)
+        keys = np.unique(sources.astype(np.int64) * len(work_ids) + targets)
+        sources, targets = keys // len(work_ids), keys % len(work_ids)
+        loops = sources == targets
+        cites = Adjacency.from_edges(sources[~loops], targets[~loops], len(work_ids))
+        is_paper = np.zeros(len(work_ids), dtype=bool)
+        is_paper[work_ids.get_indexer(papers)] = True
+
+        # Co-authors: the product of the (authors x works) incidence matrix with its transpose
+        authorship = pd.DataFrame({"work": work_ids.get_indexer(scopus_ids(authorships[0])),
+                                   "author": np.asarray(authorships[1], dtype=object)}).dropna().drop_duplicates()
+        authorship = authorship[authorship["work"] >= 0]
+        author_codes, author_names = pd.factorize(authorship["author"].astype(str), sort=True)
+        incidence = sp.csr_matrix((np.ones(len(authorship), dtype=np.int32), (author_codes, authorship["work"].to_numpy())),
+                                  shape=(len(author_names), len(work_ids)))
+        shared = (incidence @ incidence.T).tocsr()
+        author_works = shared.diagonal().astype(np.int32)
+        shared.setdiag(0)
+        shared.eliminate_zeros()
+        shared.sort_indices()
+
+        arrays = {
+            "work_ids": np.char.encode(work_ids.to_numpy(dtype=str), "ascii"),
+            "is_paper": is_paper,
+            "cites_indptr": cites.indptr,
+            "cites_indices": cites.indices,
+            "author_names": np.char.encode(np.asarray(author_names, dtype=str), "utf-8"),
+            "author_works": author_works,
+            "coauthor_indptr": shared.indptr.astype(np.int64),
+            "coauthor_indices": shared.indices.astype(np.int32),
+            "coauthor_weights": shared.data.astype(np.int32),
+        }
+        cited_by = cites.transpose()
+        arrays["cited_by_indptr"], arrays["cited_by_indices"] = cited_by.indptr, cited_by.indices
+        return cls(arrays)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        if is_graph_store(path):
+            os.remove(os.path.join(path, MANIFEST_FILE))
+        for name, filename in ARRAY_FILES.items():
+            np.save(os.path.join(path, filename), self.arrays()[name], allow_pickle=False)
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "works": self.cites.node_count,
+            "citations": len(self.cites.indices),
+            "authors": self.coauthors.node_count,
+            "coauthor_links": len(self.coauthors.indices),
+        }
+        # The manifest is written last so a half-written directory is never mistaken for a graph store
+        with open(os.path.join(path, MANIFEST_FILE), "w") as file:
+            json.dump(manifest, file, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        with open(os.path.join(path, MANIFEST_FILE)) as file:
+            manifest = json.load(file)
+        if manifest["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported graph store format version {manifest['format_version']} in {path}")
+        return cls({
+            name: np.load(os.path.join(path, filename), mmap_mode=mmap_mode, allow_pickle=False)
+            for name, filename in ARRAY_FILES.items()
+        })
+
+    def arrays(self):
+        return {
+            "work_ids": self.work_ids,
+            "is_paper": self.is_paper,
+            "cites_indptr": self.cites.indptr,
+            "cites_indices": self.cites.indices,
+            "cited_by_indptr": self.cited_by.indptr,
+            "cited_by_indices": self.cited_by.indices,
+            "author_names": self.author_names,
+            "author_works": self.author_works,
+            "coauthor_indptr": self.coauthors.indptr,
+            "coauthor_indices": self.coauthors.indices,
+            "coauthor_weights": self.coauthors.weights,
+        }
+
+    # The id and name lookups are built on first use, so loading only maps the arrays; results decode
+    # only the ids and names they return
+    @cached_property
+    def work_lookup(self):
+        return pd.Index(np.char.decode(self.work_ids, "ascii"))
+
+    @cached_property
+    def author_lookup(self):
+        return pd.Index(np.char.decode(self.author_names, "utf-8"))
+
+    def work_id_strings(self, nodes):
+        return np.char.decode(self.work_ids[nodes], "ascii").astype(object)
+
+    def author_name_strings(self, nodes):
+        return np.char.decode(self.author_names[nodes], "utf-8").astype(object)
+
+    def work_nodes(self, ids):
+        # Node of every work id (a Scopus id or a paper eid), -1 for unknown ids
+        return self.work_lookup.get_indexer(scopus_ids(ids))
+
+    def author_node(self, name):
+        return self.author_lookup.get_loc(name)
+
+    @cached_property
+    def work_pagerank(self):
+        return pagerank(self.cites)
+
+    def top_works(self, n=10):
+        # The n works with the highest PageRank, ties by citations then id
+        citations = self.cited_by.degrees()
+        order = np.lexsort((np.arange(len(citations)), -citations, -self.work_pagerank))[:n]
+        return pd.DataFrame({
+            "work_id": self.work_id_strings(order),
+            "in_corpus": self.is_paper[order],
+            "citations": citations[order],
+            "references": self.cites.degrees()[order],
+            "pagerank": self.work_pagerank[order],
+        })
+
+    def citation_neighbourhood(self, work_id, hops=1, direction="both"):
+        # Works within hops citation steps of a work: following its references ("cites"), the works
+        # citing it ("cited_by") or both, as a DataFrame of work ids and hop counts
+        adjacencies = {"cites": [self.cites], "cited_by": [self.cited_by], "both": [self.cites, self.cited_by]}[direction]
+        node = self.work_nodes([work_id])[0]
+        if node < 0:
+            raise KeyError(work_id)
+        nodes, distances = k_hop(adjacencies, [node], hops)
+        return pd.DataFrame({"work_id": self.work_id_strings(nodes), "hops": distances}).sort_values(["hops", "work_id"], ignore_index=True)
+
+    def author_degree_centrality(self):
+        # Share of the other authors each author has co-authored with
+        return self.coauthors.degrees() / max(self.coauthors.node_count - 1, 1)
+
+    def top_authors(self, n=10):
+        # The n authors with the most co-authors, ties by shared works then name
+        degrees = self.coauthors.degrees()
+        order = np.lexsort((np.arange(len(degrees)), -self.author_works, -degrees))[:n]
+        return pd.DataFrame({
+            "name": self.author_name_strings(order),
+            "works": self.author_works[order],
+            "coauthors": degrees[order],
+            "degree_centrality": self.author_degree_centrality()[order],
+        })
+
+    def top_coauthors(self, name, n=10):
+        # The n co-authors sharing the most works with an author, ties by name
+        neighbours, weights = self.coauthors.neighbours(self.author_node(name))
+        order = np.lexsort((neighbours, -weights))[:n]
+        return pd.DataFrame({"name": self.author_name_strings(neighbours[order]), "shared_works": weights[order]})
+
+    def coauthor_reach(self, name, hops):
+        # Number of other authors within hops co-author steps of an author, per hop count
+        _, distances = k_hop([self.coauthors], [self.author_node(name)], hops)
+        return np.bincount(distances, minlength=hops + 1)[1:]
+
+    def size_bytes(self):
+        return sum(array.nbytes for array in self.arrays().values())
+
+def is_graph_store(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+def build_graph_store(data_path):
+    papers_df = read_table(data_path, "papers", ["id"])
+    references_df = read_table(data_path, "references", ["paper_id", "reference_id"]).dropna()
+    authors_df = read_table(data_path, "paper_reference_author", ["reference_id", "name"]).dropna()
+    return GraphStore.build(papers_df["id"].astype(str).to_numpy(),
+                            (references_df["paper_id"].astype(str).to_numpy(), references_df["reference_id"].astype(str).to_numpy()),
+                            (authors_df["reference_id"].astype(str).to_numpy(), authors_df["name"].astype(str).to_numpy()))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the citation and co-author graph store.")
+    parser.add_argument("data_path", nargs="?", default="data/processed")
+    args = parser.parse_args(argv)
+    path = os.path.join(args.data_path, GRAPH_FOLDER)
+    start = time.perf_counter()
+    graph = build_graph_store(args.data_path)
+    graph.save(path)
+    print(f"Built {graph.cites.node_count} works, {len(graph.cites.indices)} citations, {graph.coauthors.node_count} authors "
+          f"and {len(graph.coauthors.indices) // 2} co-author pairs in {time.perf_counter() - start:.1f} s, "
+          f"{graph.size_bytes() / 2 ** 20:.1f} MB in {path}")
+    start = time.perf_counter()
+    graph = GraphStore.load(path)
+    print(f"Loaded in {(time.perf_counter() - start) * 1000:.1f} ms")
+    start = time.perf_counter()
+    top_works = graph.top_works()
+    print(f"PageRank in {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(top_works.to_string(index=False))
+    print(graph.top_authors().to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import itertools
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+from utils.utils import SerializableTokenizer
+
+class FusedLinearClassifier:
+    # All per-label linear models stacked into one (n_features, n_labels) weight matrix,
+    # so a whole batch is scored with a single sparse x dense product.
+    # weights may be float64, float32, or int8 with per-label scales (see utils.compaction).
+    def __init__(self, weights, intercepts, classes, scales=None):
+        self.weights = weights
+        self.intercepts = intercepts
+        self.classes = classes
+        self.scales = scales
+
+    @classmethod
+    def from_model(cls, model):
+        # Returns None when the model isn't a MultiOutputClassifier of binary linear estimators
+        estimators = getattr(model, "estimators_", None)
+        if not estimators:
+            return None
+        for estimator in estimators:
+            coef = getattr(estimator, "coef_", None)
+            if coef is None or coef.shape[0] != 1 or len(getattr(estimator, "classes_", ())) != 2:
+                return None
+        weights = np.ascontiguousarray(np.vstack([estimator.coef_ for estimator in estimators]).T)
+        intercepts = np.concatenate([np.ravel(estimator.intercept_) for estimator in estimators])
+        classes = np.vstack([estimator.classes_ for estimator in estimators])
+        return cls(weights, intercepts, classes)
+
+    @property
+    def n_features(self):
+        return self.weights.shape[0]
+
+    def decision_function(self, X):
+        if self.scales is None:
+            # Matching X's dtype to the weights keeps scipy from upcasting a float32 weight matrix on every call
+            return np.asarray(X.astype(self.weights.dtype, copy=False) @ self.weights) + self.intercepts
+        # Quantized weights: dequantize only the rows of the features present in the batch
+        X = sp.csr_matrix(X)
+        used, columns = np.unique(X.indices, return_inverse=True)
+        weights = self.weights[used].astype(np.float32) * self.scales
+        X_used = sp.csr_matrix((X.data.astype(np.float32), columns, X.indptr), shape=(X.shape[0], len(used)))
+        return np.asarray(X_used @ weights) + self.intercepts
+
+    def predict(self, X):
+        # Same rule as LogisticRegression.predict: positive class where the score is > 0
+        positive = self.decision_function(X) > 0
+        return np.where(positive, self.classes[:, 1], self.classes[:, 0])
+
+class TokenIdVectorizer:
+    # TF-IDF features built straight from the BPE token ids: tokenization runs batched in Rust and
+    # ids map to feature columns through a precomputed array instead of the string vocabulary_ dict.
+    # column_map (original column -> kept column or -1) drops pruned features after normalization,
+    # so the kept features keep exactly the values they had in the full vocabulary.
+    def __init__(self, tokenizer, id_to_column, idf, lowercase=True, norm="l2", column_map=None):
+        self.tokenizer = tokenizer
+        self.id_to_column = id_to_column
+        self.idf = idf
+        self.lowercase = lowercase
+        self.norm = norm
+        self.column_map = column_map
+        self.n_features = len(idf) if column_map is None else int((column_map >= 0).sum())
+
+    @classmethod
+    def from_tfidf(cls, tfidf):
+        # Returns None unless the vectorizer is a plain unigram TF-IDF over SerializableTokenizer tokens
+        if not isinstance(tfidf.tokenizer, SerializableTokenizer):
+            return None
+        if (tfidf.input != "content" or tfidf.analyzer != "word" or tfidf.ngram_range != (1, 1)
+                or tfidf.preprocessor is not None or tfidf.strip_accents is not None
+                or tfidf.stop_words is not None or tfidf.binary or tfidf.sublinear_tf
+                or not tfidf.use_idf):
+            return None
+        tokenizer = tfidf.tokenizer.tokenizer
+        vocab = tokenizer.get_vocab()
+        id_to_column = np.full(max(vocab.values()) + 1, -1, dtype=np.int32)
+        for token, token_id in vocab.items():
+            column = tfidf.vocabulary_.get(token)
+            if column is not None:
+                id_to_column[token_id] = column
+        return cls(tokenizer, id_to_column, tfidf.idf_, lowercase=tfidf.lowercase, norm=tfidf.norm)
+
+    def tokenize(self, texts):
+        if self.lowercase:
+            texts = [text.lower() for text in texts]
+        return self.tokenizer.encode_batch(texts)
+
+    def transform_encodings(self, encodings):
+        token_ids = [encoding.ids for encoding in encodings]
+        lengths = np.fromiter(map(len, token_ids), dtype=np.int64, count=len(token_ids))
+        ids = np.fromiter(itertools.chain.from_iterable(token_ids), dtype=np.int64, count=lengths.sum())
+        columns = self.id_to_column[ids]
+        known = columns >= 0
+        rows = np.repeat(np.arange(len(encodings)), lengths)[known]
+        indptr = np.zeros(len(encodings) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(encodings)), out=indptr[1:])
+        X = sp.csr_matrix(
+            (np.ones(len(rows), dtype=np.float64), columns[known], indptr),
+            shape=(len(encodings), len(self.idf)),
+        )
+        # Merges repeated tokens into counts and sorts the indices, like CountVectorizer does
+        X.sum_duplicates()
+        X.data *= self.idf[X.indices]
+        if self.norm is not None:
+            X = normalize(X, norm=self.norm, copy=False)
+        if self.column_map is not None:
+            X = self.drop_pruned_columns(X)
+        return X
+
+    def drop_pruned_columns(self, X):
+        columns = self.column_map[X.indices]
+        kept = columns >= 0
+        # The map is increasing on kept columns, so the indices stay sorted
+        indptr = np.concatenate(([0], np.cumsum(kept)))[X.indptr]
+        return sp.csr_matrix((X.data[kept], columns[kept], indptr), shape=(X.shape[0], self.n_features))
+
+    def transform(self, texts):
+        return self.transform_encodings(self.tokenize(texts))
@@ -0,0 +1,100 @@
+import bisect
+import threading
+
+# Upper bounds in seconds, Prometheus-style (each bucket counts observations <= its bound)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+STAGES = ("tokenize", "vectorize", "classify", "decode_labels", "build_predictions")
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        # Linear interpolation inside the bucket holding the q-th observation, like histogram_quantile()
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, bucket_count in enumerate(self.counts):
+            if cumulative + bucket_count >= rank and bucket_count > 0:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": dict(zip([*map(str, self.buckets), "+Inf"], self.counts)),
+        }
+
+    def to_prometheus(self, name, labels=""):
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip([*map(str, self.buckets), "+Inf"], self.counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}')
+        braces = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{braces} {self.sum}")
+        lines.append(f"{name}_count{braces} {self.count}")
+        return lines
+
+class PipelineMetrics:
+    # Per-stage wall time, batch size and token count histograms for Pipeline.predict
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stage_seconds = {stage: Histogram(LATENCY_BUCKETS) for stage in STAGES}
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.tokens = Histogram(TOKEN_BUCKETS)
+
+    def observe(self, stage_seconds, batch_size, tokens=None):
+        with self.lock:
+            for stage, seconds in stage_seconds.items():
+                self.stage_seconds[stage].observe(seconds)
+            self.batch_size.observe(batch_size)
+            if tokens is not None:
+                self.tokens.observe(tokens)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                "stage_seconds": {stage: histogram.to_dict() for stage, histogram in self.stage_seconds.items()},
+                "batch_size": self.batch_size.to_dict(),
+                "tokens": self.tokens.to_dict(),
+            }
+
+    def to_prometheus(self, prefix="pipeline"):
+        with self.lock:
+            lines = [
+                f"# HELP {prefix}_stage_seconds Wall time of each Pipeline.predict stage",
+                f"# TYPE {prefix}_stage_seconds histogram",
+            ]
+            for stage, histogram in self.stage_seconds.items():
+                lines += histogram.to_prometheus(f"{prefix}_stage_seconds", f'stage="{stage}"')
+            lines += [
+                f"# HELP {prefix}_batch_size Number of texts per Pipeline.predict call",
+                f"# TYPE {prefix}_batch_size histogram",
+                *self.batch_size.to_prometheus(f"{prefix}_batch_size"),
+                f"# HELP {prefix}_tokens Number of tokens per Pipeline.predict call",
+                f"# TYPE {prefix}_tokens histogram",
+                *self.tokens.to_prometheus(f"{prefix}_tokens"),
+            ]
+            return "\n".join(lines) + "\n"
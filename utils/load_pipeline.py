@@ -1,38 +1,133 @@
 from utils.utils import SerializableTokenizer
+from utils.inference import FusedLinearClassifier, TokenIdVectorizer
+from utils.artifact import is_artifact, load_artifact
+from utils.cache import PredictionCache, text_key
+from utils.instrumentation import PipelineMetrics
 import pandas as pd
+import numpy as np
 import joblib
+import time
+
+class SubjectLookup:
+    # Label metadata aligned to mlb.classes_, so resolving a label is an array index
+    def __init__(self, classes, subjects_df):
+        subjects = subjects_df.drop_duplicates(subset=["abbreviation"]).set_index("abbreviation").reindex(classes)
+        self.classes = np.asarray(classes, dtype=object)
+        self.full_names = subjects["subject_area"].to_numpy(dtype=object)
+        self.supergroups = subjects["supergroup"].to_numpy(dtype=object)
+        self.index = {subject: i for i, subject in enumerate(self.classes)}
 
 class Prediction:
-    def __init__(self, subjects, subjects_df):
-        self.subjects = [subject for subject in subjects]
-        self.subjects_df = subjects_df
-    
+    __slots__ = ("indices", "lookup")
+
+    def __init__(self, indices, lookup):
+        self.indices = indices
+        self.lookup = lookup
+
     def get_subjects(self):
-        return self.subjects
+        return self.lookup.classes[self.indices].tolist()
 
     def subject_to_full_name(self, subject):
-        return self.subjects_df[self.subjects_df["abbreviation"] == subject]["subject_area"].values[0]
-    
+        return self.lookup.full_names[self.lookup.index[subject]]
+
     def subject_to_supergroup(self, subject):
-        return self.subjects_df[self.subjects_df["abbreviation"] == subject]["supergroup"].values[0]
-    
+        return self.lookup.supergroups[self.lookup.index[subject]]
+
     def get_full_names(self):
-        return [self.subject_to_full_name(subject) for subject in self.subjects]
-    
+        return self.lookup.full_names[self.indices].tolist()
+
     def get_supergroups(self):
-        return list({self.subject_to_supergroup(subject) for subject in self.subjects})
+        return list(dict.fromkeys(self.lookup.supergroups[self.indices].tolist()))
 
 class Pipeline:
-    def __init__(self, pipeline_path, subjects_path):
-        pipeline = joblib.load(pipeline_path)
-        self.tfidf = pipeline["tfidf"]
-        self.mlb = pipeline["mlb"]
-        self.model = pipeline["model"]
+    # pipeline_path is either a joblib pickle or a directory in the artifact format (see utils.artifact).
+    # cache_size > 0 keeps an LRU cache of predictions keyed by the normalized text.
+    # instrument=True records per-stage timings into self.metrics.
+    def __init__(self, pipeline_path, subjects_path, cache_size=0, cache_ttl=None, instrument=False):
+        if is_artifact(pipeline_path):
+            # The sklearn objects aren't part of the artifact, only the arrays the fast paths need
+            self.tfidf = self.mlb = self.model = None
+            self.vectorizer, self.classifier, classes = load_artifact(pipeline_path)
+        else:
+            pipeline = joblib.load(pipeline_path)
+            self.tfidf = pipeline["tfidf"]
+            self.mlb = pipeline["mlb"]
+            self.model = pipeline["model"]
+            classes = self.mlb.classes_
+
+            # Fall back to the sklearn objects when they can't be replaced by the fast paths
+            vectorizer = TokenIdVectorizer.from_tfidf(self.tfidf)
+            self.vectorizer = vectorizer if vectorizer is not None else self.tfidf
+            fused = FusedLinearClassifier.from_model(self.model)
+            self.classifier = fused if fused is not None else self.model
 
         self.subjects_df = pd.read_csv(subjects_path)
-    
+        self.lookup = SubjectLookup(classes, self.subjects_df)
+
+        self.lowercase = getattr(self.vectorizer, "lowercase", False)
+        self.cache = PredictionCache(cache_size, cache_ttl) if cache_size else None
+        self.metrics = PipelineMetrics() if instrument else None
+
     def predict(self, texts):
-        X_predict = self.tfidf.transform(texts)
-        y_predict = self.model.predict(X_predict)
-        predicted_subjects = self.mlb.inverse_transform(y_predict)
-        return [Prediction(subjects, self.subjects_df) for subjects in predicted_subjects]
\ No newline at end of file
+        if self.cache is None:
+            return self.predict_uncached(texts)
+        keys = [text_key(text, self.lowercase) for text in texts]
+        # Each distinct text is looked up once, and only the distinct cache misses go through the model.
+        # The repeats of a text within the batch are counted as cache hits.
+        first_positions = {}
+        for i, key in enumerate(keys):
+            first_positions.setdefault(key, i)
+        self.cache.count_hits(len(keys) - len(first_positions))
+        found = {key: self.cache.get(key) for key in first_positions}
+        missed = {key: i for key, i in first_positions.items() if found[key] is None}
+        if missed:
+            computed = dict(zip(missed, self.predict_uncached([texts[i] for i in missed.values()])))
+            for key, prediction in computed.items():
+                self.cache.put(key, prediction)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def predict_uncached(self, texts):
+        if self.metrics is not None:
+            return self.predict_instrumented(texts)
+        X_predict = self.vectorizer.transform(texts)
+        y_predict = self.classifier.predict(X_predict)
+        return self.to_predictions(y_predict)
+
+    def predict_instrumented(self, texts):
+        # Same steps as predict_uncached, timed one by one. Tokenization can only be
+        # timed on its own with the TokenIdVectorizer, otherwise it is part of "vectorize".
+        stage_seconds = {}
+        tokens = None
+        start = time.perf_counter()
+        if isinstance(self.vectorizer, TokenIdVectorizer):
+            encodings = self.vectorizer.tokenize(texts)
+            tokens = sum(len(encoding) for encoding in encodings)
+            stage_seconds["tokenize"] = time.perf_counter() - start
+            start = time.perf_counter()
+            X_predict = self.vectorizer.transform_encodings(encodings)
+        else:
+            X_predict = self.vectorizer.transform(texts)
+        stage_seconds["vectorize"] = time.perf_counter() - start
+        start = time.perf_counter()
+        y_predict = self.classifier.predict(X_predict)
+        stage_seconds["classify"] = time.perf_counter() - start
+        start = time.perf_counter()
+        labels = self.decode_labels(y_predict)
+        stage_seconds["decode_labels"] = time.perf_counter() - start
+        start = time.perf_counter()
+        predictions = [Prediction(indices, self.lookup) for indices in labels]
+        stage_seconds["build_predictions"] = time.perf_counter() - start
+        self.metrics.observe(stage_seconds, len(texts), tokens)
+        return predictions
+
+    def decode_labels(self, y_predict):
+        # Split the nonzero (row, label) pairs of the indicator matrix into per-row label indices
+        if len(y_predict) == 0:
+            return []
+        rows, labels = np.nonzero(np.asarray(y_predict))
+        bounds = np.searchsorted(rows, np.arange(1, len(y_predict)))
+        return np.split(labels, bounds)
+
+    def to_predictions(self, y_predict):
+        return [Prediction(indices, self.lookup) for indices in self.decode_labels(y_predict)]
@@ -0,0 +1,122 @@
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.instrumentation import LATENCY_BUCKETS, Histogram
+
+PHASES = ("data", "render")
+
+class DashboardProfiler:
+    # Wall time of every dashboard section per rerun, split into data preparation and rendering, and the
+    # calls and misses of every cached function. Data time is the time spent in the cached functions
+    # (see cached()), render time the rest of the section. Each rerun's sections are kept for the thread
+    # running it, aggregated for the process and, with a log_path, appended to it as JSON lines.
+    def __init__(self, log_path=None):
+        self.log_path = log_path
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.rerun_ids = itertools.count(1)
+        self.section_seconds = {}
+        self.cache_counts = {}
+
+    def start_rerun(self):
+        self.local.rerun = next(self.rerun_ids)
+        self.local.sections = []
+        self.local.section = None
+        self.local.depth = 0
+
+    def last_rerun(self):
+        # Sections timed so far in the rerun running on this thread
+        return list(getattr(self.local, "sections", []))
+
+    @contextmanager
+    def section(self, name):
+        record = {"section": name, "data_seconds": 0.0, "render_seconds": 0.0, "total_seconds": 0.0,
+                  "cache_calls": 0, "cache_misses": 0}
+        outer = getattr(self.local, "section", None)
+        self.local.section = record
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["total_seconds"] = time.perf_counter() - start
+            record["render_seconds"] = max(0.0, record["total_seconds"] - record["data_seconds"])
+            self.local.section = outer
+            if hasattr(self.local, "sections"):
+                self.local.sections.append(record)
+            with self.lock:
+                for phase in PHASES:
+                    self.section_seconds.setdefault((name, phase), Histogram(LATENCY_BUCKETS)).observe(record[f"{phase}_seconds"])
+
+    def end_rerun(self):
+        if not self.log_path or not hasattr(self.local, "sections"):
+            return
+        timestamp = time.time()
+        lines = [json.dumps({"timestamp": timestamp, "rerun": self.local.rerun, **record}) for record in self.local.sections]
+        with self.lock, open(self.log_path, "a") as file:
+            file.writelines(line + "\n" for line in lines)
+
+    def count_cache(self, name, field):
+        with self.lock:
+            counts = self.cache_counts.setdefault(name, {"calls": 0, "misses": 0})
+            counts[field] += 1
+        record = getattr(self.local, "section", None)
+        if record is not None:
+            record[f"cache_{field}"] += 1
+
+    def cached(self, cache):
+        # Wraps a Streamlit cache decorator (st.cache_data, st.cache_resource(...)). Every call is counted
+        # and timed as data preparation, and the function body, which only runs on a cache miss, counts
+        # the miss. Calls made from inside another cached function add no data time of their own.
+        def decorator(function):
+            name = function.__name__
+
+            @functools.wraps(function)
+            def on_miss(*args, **kwargs):
+                self.count_cache(name, "misses")
+                return function(*args, **kwargs)
+
+            cached_function = cache(on_miss)
+
+            @functools.wraps(function)
+            def call(*args, **kwargs):
+                self.count_cache(name, "calls")
+                depth = getattr(self.local, "depth", 0)
+                self.local.depth = depth + 1
+                start = time.perf_counter()
+                try:
+                    return cached_function(*args, **kwargs)
+                finally:
+                    self.local.depth = depth
+                    record = getattr(self.local, "section", None)
+                    if depth == 0 and record is not None:
+                        record["data_seconds"] += time.perf_counter() - start
+
+            call.clear = cached_function.clear
+            return call
+        return decorator
+
+    def section_summary(self):
+        with self.lock:
+            rows = {}
+            for (name, phase), histogram in self.section_seconds.items():
+                row = rows.setdefault(name, {"section": name, "reruns": histogram.count})
+                row[f"{phase} mean (ms)"] = histogram.sum / histogram.count * 1000
+                row[f"{phase} p95 (ms)"] = histogram.quantile(0.95) * 1000
+            return list(rows.values())
+
+    def cache_summary(self):
+        with self.lock:
+            return [
+                {"function": name, "calls": counts["calls"], "hits": counts["calls"] - counts["misses"],
+                 "misses": counts["misses"], "hit rate": 1 - counts["misses"] / counts["calls"] if counts["calls"] else None}
+                for name, counts in sorted(self.cache_counts.items())
+            ]
+
+# Shared by every session of the process: app.py runs again on every rerun, this module is imported once.
+# Set DASHBOARD_PROFILE_LOG to a file path to log every rerun's section timings.
+PROFILER = DashboardProfiler(os.environ.get("DASHBOARD_PROFILE_LOG"))
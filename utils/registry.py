@@ -0,0 +1,180 @@
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+
+from utils.artifact import is_artifact
+from utils.load_pipeline import Pipeline
+
+# Registry layout:
+#   <root>/manifest.json   {"active": "<version>", "versions": {"<version>": {"created": ...}}}
+#   <root>/<version>/      an artifact directory (see utils.artifact) or a directory holding pipeline.pkl
+MANIFEST_FILE = "manifest.json"
+PICKLE_FILE = "pipeline.pkl"
+
+def read_manifest(root):
+    path = os.path.join(root, MANIFEST_FILE)
+    if not os.path.isfile(path):
+        return {"active": None, "versions": {}}
+    with open(path) as file:
+        return json.load(file)
+
+def write_manifest(root, manifest):
+    # Written to a temporary file and renamed, so readers never see a partial manifest
+    path = os.path.join(root, MANIFEST_FILE)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w") as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(temporary_path, path)
+
+def version_path(root, version):
+    path = os.path.join(root, version)
+    return path if is_artifact(path) else os.path.join(path, PICKLE_FILE)
+
+def publish(root, source_path, version, activate=True):
+    manifest = read_manifest(root)
+    if version in manifest["versions"]:
+        raise ValueError(f"Version {version} already exists in {root}")
+    destination = os.path.join(root, version)
+    if os.path.isdir(source_path):
+        shutil.copytree(source_path, destination)
+    else:
+        os.makedirs(destination)
+        shutil.copy2(source_path, os.path.join(destination, PICKLE_FILE))
+    manifest["versions"][version] = {"created": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "source": source_path}
+    if activate:
+        manifest["active"] = version
+    write_manifest(root, manifest)
+
+def activate(root, version):
+    manifest = read_manifest(root)
+    if version not in manifest["versions"]:
+        raise ValueError(f"Unknown version {version} in {root}")
+    manifest["active"] = version
+    write_manifest(root, manifest)
+
+class ModelRegistry:
+    # Serves the active Pipeline of a registry directory and swaps to a new one when the manifest changes.
+    # get() hands out a reference, so predictions already running keep the old pipeline until they finish;
+    # the old pipeline is only released once the new one is loaded and swapped in.
+    # Without a manifest, fallback_path (a pickle or artifact) is served with version None and is_fallback set,
+    # so it can't be mistaken for a manifest version of any name.
+    def __init__(self, root, subjects_path, fallback_path=None, poll_interval=2.0, **pipeline_options):
+        self.root = root
+        self.subjects_path = subjects_path
+        self.fallback_path = fallback_path
+        self.poll_interval = poll_interval
+        self.pipeline_options = pipeline_options
+        self.lock = threading.Lock()
+        self.reload_lock = threading.Lock()
+        self.pipeline = None
+        self.version = None
+        self.is_fallback = False
+        self.loaded_at = None
+        self.reload_seconds = None
+        self.last_error = None
+        self.manifest_stamp = None
+        self.checked_at = 0.0
+        self.check(force=True)
+
+    def manifest_stamp_now(self):
+        try:
+            stat = os.stat(os.path.join(self.root, MANIFEST_FILE))
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    def check(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.checked_at < self.poll_interval:
+            return
+        self.checked_at = now
+        stamp = self.manifest_stamp_now()
+        if not force and stamp == self.manifest_stamp:
+            return
+        # Another thread is already reloading, keep serving the current pipeline meanwhile
+        if not self.reload_lock.acquire(blocking=force):
+            return
+        try:
+            active = read_manifest(self.root)["active"] if stamp is not None else None
+            if active is not None:
+                self.load(active, version_path(self.root, active))
+            elif self.pipeline is None and self.fallback_path is not None:
+                self.load(None, self.fallback_path, is_fallback=True)
+            self.manifest_stamp = stamp
+            # Also clears the error of a broken version when the manifest goes back to the one in service
+            with self.lock:
+                self.last_error = None
+        except Exception as e:
+            # A broken version leaves the previous one in service
+            self.last_error = f"{type(e).__name__}: {e}"
+            self.manifest_stamp = stamp
+            if self.pipeline is None:
+                raise
+        finally:
+            self.reload_lock.release()
+
+    def load(self, version, path, is_fallback=False):
+        if self.pipeline is not None and version == self.version and is_fallback == self.is_fallback:
+            return
+        start = time.perf_counter()
+        pipeline = Pipeline(path, self.subjects_path, **self.pipeline_options)
+        reload_seconds = time.perf_counter() - start
+        with self.lock:
+            self.pipeline = pipeline
+            self.version = version
+            self.is_fallback = is_fallback
+            self.loaded_at = time.time()
+            self.reload_seconds = reload_seconds
+
+    def get(self):
+        return self.get_with_status()[0]
+
+    def get_with_status(self):
+        # The pipeline and the status of that same pipeline, read under one lock so a swap in between
+        # can't pair the old pipeline with the new version
+        self.check()
+        with self.lock:
+            return self.pipeline, self.current_status()
+
+    def status(self):
+        with self.lock:
+            return self.current_status()
+
+    def current_status(self):
+        # Callers hold self.lock
+        return {
+            "version": self.version,
+            "is_fallback": self.is_fallback,
+            "loaded_at": self.loaded_at,
+            "reload_seconds": self.reload_seconds,
+            "last_error": self.last_error,
+        }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the versioned model registry.")
+    parser.add_argument("--root", default="models/registry")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    publish_parser = subparsers.add_parser("publish", help="Copy a pickle or artifact into the registry")
+    publish_parser.add_argument("source_path")
+    publish_parser.add_argument("version")
+    publish_parser.add_argument("--no-activate", action="store_true")
+    activate_parser = subparsers.add_parser("activate", help="Make an existing version the active one")
+    activate_parser.add_argument("version")
+    subparsers.add_parser("list", help="List versions")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.root, exist_ok=True)
+    if args.command == "publish":
+        publish(args.root, args.source_path, args.version, activate=not args.no_activate)
+    elif args.command == "activate":
+        activate(args.root, args.version)
+    manifest = read_manifest(args.root)
+    for version, info in manifest["versions"].items():
+        marker = "*" if version == manifest["active"] else " "
+        print(f"{marker} {version}  {info['created']}  {info.get('source', '')}")
+
+if __name__ == "__main__":
+    main()
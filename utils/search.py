@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from tokenizers import Tokenizer
+
+from utils.columnar import read_table
+
+# An inverted index over the titles and abstracts of the papers table, tokenized with the project's BPE
+# tokenizer. A search index directory holds the tokenizer, a manifest and flat .npy arrays that are
+# memory-mapped on load. Documents are the rows of the papers table, numbered in table order.
+# Posting lists are sorted by document and delta-encoded: each gap is a uint16, and gaps that don't fit
+# are stored as GAP_ESCAPE with their value in the uint32 exceptions array (the first document of a
+# list is a gap from 0). Term frequencies are capped at 255, document lengths at 65535 tokens, and the
+# paper ids are stored as ASCII bytes.
+SEARCH_FOLDER = "search"
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+TOKENIZER_FILE = "tokenizer.json"
+ARRAY_FILES = {
+    "offsets": "offsets.npy",
+    "exception_offsets": "exception_offsets.npy",
+    "gaps": "gaps.npy",
+    "exceptions": "exceptions.npy",
+    "term_freqs": "term_freqs.npy",
+    "doc_lengths": "doc_lengths.npy",
+    "doc_ids": "doc_ids.npy",
+}
+GAP_ESCAPE = np.iinfo(np.uint16).max
+BM25_K1 = 1.2
+BM25_B = 0.75
+BUILD_BATCH_SIZE = 4096
+
+def indexed_terms(tokenizer):
+    # Token ids worth indexing: tokens with a letter or digit, so punctuation isn't indexed
+    vocab = tokenizer.get_vocab()
+    indexed = np.zeros(max(vocab.values()) + 1, dtype=bool)
+    for token, token_id in vocab.items():
+        indexed[token_id] = any(character.isalnum() for character in token)
+    return indexed
+
+def document_texts(papers_df):
+    return (papers_df["title"].fillna("").astype(str) + " " + papers_df["abstract"].fillna("").astype(str)).tolist()
+
+class SearchIndex:
+    def __init__(self, tokenizer, arrays, avg_doc_length):
+        self.tokenizer = tokenizer
+        self.indexed = indexed_terms(tokenizer)
+        self.offsets = arrays["offsets"]
+        self.exception_offsets = arrays["exception_offsets"]
+        self.gaps = arrays["gaps"]
+        self.exceptions = arrays["exceptions"]
+        self.term_freqs = arrays["term_freqs"]
+        self.doc_lengths = arrays["doc_lengths"]
+        self.doc_ids = arrays["doc_ids"]
+        self.doc_count = len(self.doc_lengths)
+        self.avg_doc_length = avg_doc_length
+
+    @classmethod
+    def build(cls, tokenizer, texts, doc_ids):
+        indexed = indexed_terms(tokenizer)
+        vocab_size = len(indexed)
+        doc_count = len(texts)
+        pairs, freqs = [], []
+        doc_lengths = np.zeros(doc_count, dtype=np.int64)
+        # (term, document) pairs with their counts, one batch of documents at a time; the keys of a
+        # batch are sorted by term then document, and batches come in document order
+        for start in range(0, doc_count, BUILD_BATCH_SIZE):
+            encodings = tokenizer.encode_batch(texts[start:start + BUILD_BATCH_SIZE])
+            lengths = np.fromiter((len(encoding.ids) for encoding in encodings), dtype=np.int64, count=len(encodings))
+            ids = np.concatenate([np.asarray(encoding.ids, dtype=np.int64) for encoding in encodings] or [np.zeros(0, np.int64)])
+            docs = np.repeat(np.arange(start, start + len(encodings)), lengths)
+            keep = indexed[ids]
+            ids, docs = ids[keep], docs[keep]
+            doc_lengths[start:start + len(encodings)] = np.bincount(docs - start, minlength=len(encodings))
+            keys, counts = np.unique(ids * doc_count + docs, return_counts=True)
+            pairs.append(keys)
+            freqs.append(counts)
+        keys = np.concatenate(pairs or [np.zeros(0, np.int64)])
+        counts = np.concatenate(freqs or [np.zeros(0, np.int64)])
+        order = np.argsort(keys // doc_count, kind="stable")
+        keys, counts = keys[order], counts[order]
+        terms, docs = keys // doc_count, keys % doc_count
+
+        offsets = np.zeros(vocab_size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=vocab_size), out=offsets[1:])
+        gaps = np.diff(docs, prepend=0)
+        list_starts = offsets[:-1][offsets[:-1] < offsets[1:]]
+        gaps[list_starts] = docs[list_starts]
+        escaped = gaps >= GAP_ESCAPE
+        exception_offsets = np.zeros(vocab_size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms[escaped], minlength=vocab_size), out=exception_offsets[1:])
+        arrays = {
+            "offsets": offsets,
+            "exception_offsets": exception_offsets,
+            "gaps": np.where(escaped, GAP_ESCAPE, gaps).astype(np.uint16),
+            "exceptions": gaps[escaped].astype(np.uint32),
+            "term_freqs": np.minimum(counts, np.iinfo(np.uint8).max).astype(np.uint8),
+            "doc_lengths": np.minimum(doc_lengths, np.iinfo(np.uint16).max).astype(np.uint16),
+            "doc_ids": np.char.encode(np.asarray(doc_ids, dtype=str), "ascii"),
+        }
+        return cls(tokenizer, arrays, float(doc_lengths.mean()) if doc_count else 0.0)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        if is_search_index(path):
+            os.remove(os.path.join(path, MANIFEST_FILE))
+        arrays = {name: getattr(self, name) for name in ARRAY_FILES}
+        for name, filename in ARRAY_FILES.items():
+            np.save(os.path.join(path, filename), arrays[name], allow_pickle=False)
+        self.tokenizer.save(os.path.join(path, TOKENIZER_FILE))
+        manifest = {"format_version": FORMAT_VERSION, "doc_count": self.doc_count, "avg_doc_length": self.avg_doc_length}
+        # The manifest is written last so a half-written directory is never mistaken for an index
+        with open(os.path.join(path, MANIFEST_FILE), "w") as file:
+            json.dump(manifest, file, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        with open(os.path.join(path, MANIFEST_FILE)) as file:
+            manifest = json.load(file)
+        if manifest["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported search index format version {manifest['format_version']} in {path}")
+        arrays = {
+            name: np.load(os.path.join(path, filename), mmap_mode=mmap_mode, allow_pickle=False)
+            for name, filename in ARRAY_FILES.items()
+        }
+        tokenizer = Tokenizer.from_file(os.path.join(path, TOKENIZER_FILE))
+        return cls(tokenizer, arrays, manifest["avg_doc_length"])
+
+    def query_terms(self, text):
+        ids = np.asarray(self.tokenizer.encode(text).ids, dtype=np.int64)
+        return np.unique(ids[self.indexed[ids]])
+
+    def postings(self, term):
+        # Documents (ascending) and term frequencies of one term
+        start, stop = self.offsets[term], self.offsets[term + 1]
+        gaps = self.gaps[start:stop].astype(np.int64)
+        escaped = np.flatnonzero(gaps == GAP_ESCAPE)
+        if len(escaped):
+            gaps[escaped] = self.exceptions[self.exception_offsets[term]:self.exception_offsets[term + 1]]
+        return np.cumsum(gaps), self.term_freqs[start:stop]
+
+    def search(self, text, k=10, k1=BM25_K1, b=BM25_B):
+        # The k best documents for the text by BM25, as (paper ids, scores), best first, ties by document
+        docs, weights = [], []
+        for term in self.query_terms(text):
+            term_docs, freqs = self.postings(term)
+            if not len(term_docs):
+                continue
+            idf = np.log(1 + (self.doc_count - len(term_docs) + 0.5) / (len(term_docs) + 0.5))
+            freqs = freqs.astype(np.float32)
+            norms = k1 * (1 - b + b * self.doc_lengths[term_docs] / self.avg_doc_length)
+            docs.append(term_docs)
+            weights.append(idf * freqs * (k1 + 1) / (freqs + norms))
+        if not docs:
+            return [], np.zeros(0)
+        scores = np.bincount(np.concatenate(docs), weights=np.concatenate(weights), minlength=self.doc_count)
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            # Everything scoring at least the k-th best score, so ties at the cut are broken by document too
+            kth_score = -np.partition(-scores[candidates], k - 1)[k - 1]
+            candidates = candidates[scores[candidates] >= kth_score]
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))][:k]
+        return np.char.decode(self.doc_ids[candidates], "ascii").tolist(), scores[candidates]
+
+    def size_bytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAY_FILES)
+
+def is_search_index(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+def build_search_index(data_path, tokenizer_path):
+    papers_df = read_table(data_path, "papers", ["id", "title", "abstract"])
+    return SearchIndex.build(Tokenizer.from_file(tokenizer_path), document_texts(papers_df), papers_df["id"].astype(str).to_numpy())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the full-text search index over paper titles and abstracts.")
+    parser.add_argument("data_path", nargs="?", default="data/processed")
+    parser.add_argument("--tokenizer", default="models/tokenizer.json")
+    parser.add_argument("--query", action="append", default=[], help="Run a query against the built index")
+    args = parser.parse_args(argv)
+    index_path = os.path.join(args.data_path, SEARCH_FOLDER)
+    start = time.perf_counter()
+    index = build_search_index(args.data_path, args.tokenizer)
+    index.save(index_path)
+    print(f"Indexed {index.doc_count} documents in {time.perf_counter() - start:.1f} s, "
+          f"{index.size_bytes() / 2 ** 20:.1f} MB in {index_path}")
+    index = SearchIndex.load(index_path)
+    for query in args.query:
+        start = time.perf_counter()
+        doc_ids, scores = index.search(query)
+        print(f"{query!r}: {(time.perf_counter() - start) * 1000:.1f} ms")
+        for doc_id, score in zip(doc_ids, scores):
+            print(f"  {score:8.3f}  {doc_id}")
+
+if __name__ == "__main__":
+    main()
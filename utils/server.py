@@ -0,0 +1,229 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.load_pipeline import Pipeline
+
+PIPELINE_PATH = "models/pipeline/pipeline.pkl"
+PIPELINE_ARTIFACT_PATH = "models/pipeline/artifact"
+SUBJECTS_PATH = "data/processed/subjects.csv"
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+MAX_BODY_SIZE = 1024 * 1024
+
+def prediction_to_dict(prediction):
+    return {
+        "subjects": prediction.get_subjects(),
+        "full_names": prediction.get_full_names(),
+        "supergroups": prediction.get_supergroups(),
+    }
+
+class MicroBatcher:
+    # Collects concurrent single-text requests into one predict call, bounded by max_batch_size
+    # and by max_wait seconds after the first request of the batch arrived.
+    # submit() raises asyncio.QueueFull when max_queue_size requests are already waiting.
+    def __init__(self, predict, max_batch_size=64, max_wait=0.005, max_queue_size=1024, executor=None):
+        self.predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue(max_queue_size)
+        self.executor = executor or ThreadPoolExecutor(max_workers=1)
+        self.getter = None
+        self.task = None
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=True)
+
+    async def submit(self, text):
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((text, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise
+        return await future
+
+    async def next_item(self, timeout):
+        # The pending get() is kept across timeouts instead of being cancelled, so no item is lost
+        if self.getter is None:
+            self.getter = asyncio.ensure_future(self.queue.get())
+        done, _ = await asyncio.wait({self.getter}, timeout=timeout)
+        if not done:
+            return None
+        item = self.getter.result()
+        self.getter = None
+        return item
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.next_item(None)]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                item = await self.next_item(max(0.0, deadline - loop.time()))
+                if item is None:
+                    break
+                batch.append(item)
+            texts = [text for text, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.predict, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "queued": self.queue.qsize(),
+            "rejected": self.rejected,
+        }
+
+class InferenceServer:
+    def __init__(self, pipeline, max_batch_size=64, max_wait=0.005, max_queue_size=1024):
+        self.pipeline = pipeline
+        self.batcher_options = dict(max_batch_size=max_batch_size, max_wait=max_wait, max_queue_size=max_queue_size)
+        self.batcher = None
+        self.started_at = time.time()
+
+    def predict(self, texts):
+        # Runs on the batcher's worker thread
+        return [prediction_to_dict(prediction) for prediction in self.pipeline.predict(texts)]
+
+    async def serve(self, host, port):
+        self.batcher = MicroBatcher(self.predict, **self.batcher_options)
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Serving on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload = await self.route(method, path, body)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self.write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        method, path, _ = request_line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY_SIZE:
+            # The unread body makes the connection unusable, so it is closed after the error
+            headers["connection"] = "close"
+            return method, None, headers, b""
+        body = await reader.readexactly(length) if length > 0 else b""
+        return method, path, headers, body
+
+    async def route(self, method, path, body):
+        if path is None:
+            return 413, {"error": "Request body too large"}
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/stats":
+            stats = {"uptime": time.time() - self.started_at, "batcher": self.batcher.stats()}
+            if self.pipeline.cache is not None:
+                stats["cache"] = self.pipeline.cache.stats()
+            return 200, stats
+        if path != "/predict":
+            return 404, {"error": f"Unknown path {path}"}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+        try:
+            text = json.loads(body)["text"]
+            if not isinstance(text, str):
+                raise TypeError
+        except (ValueError, KeyError, TypeError):
+            return 400, {"error": 'Expected a JSON body like {"text": "..."}'}
+        try:
+            return 200, await self.batcher.submit(text)
+        except asyncio.QueueFull:
+            return 503, {"error": "Too many pending requests, retry later"}
+        except Exception as e:
+            return 500, {"error": repr(e)}
+
+    def write_response(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            "\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the subject classifier over HTTP with micro-batching.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--pipeline-path", default=None,
+                        help="Defaults to models/pipeline/artifact if present, else models/pipeline/pipeline.pkl")
+    parser.add_argument("--subjects-path", default=SUBJECTS_PATH)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--max-queue-size", type=int, default=1024)
+    parser.add_argument("--cache-size", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    pipeline_path = args.pipeline_path
+    if pipeline_path is None:
+        pipeline_path = PIPELINE_ARTIFACT_PATH if os.path.isdir(PIPELINE_ARTIFACT_PATH) else PIPELINE_PATH
+    pipeline = Pipeline(pipeline_path, args.subjects_path, cache_size=args.cache_size)
+    server = InferenceServer(pipeline, max_batch_size=args.max_batch_size,
+                             max_wait=args.max_wait_ms / 1000, max_queue_size=args.max_queue_size)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
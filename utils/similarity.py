@@ -0,0 +1,252 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+from utils.columnar import read_table
+from utils.search import document_texts
+
+# Nearest papers by cosine similarity in the TF-IDF space of the pipeline's vectorizer. A similarity
+# index directory holds a manifest and flat .npy arrays that are memory-mapped on load: the
+# L2-normalized TF-IDF rows of the papers table as CSR (float32 data, int32 indices, int64 indptr) and
+# the paper ids as ASCII bytes. The manifest records a fingerprint of the vectorizer, so an index is
+# only used with the model it was built with.
+# Optionally the index holds random-projection signatures (one bit per projection, the sign of the row
+# projected on a random +-1 vector) to prefilter candidates by Hamming distance before the exact scores.
+# Signatures are stored word-major, as (bits / 64, documents) little-endian uint64, so the distances to
+# a query add up one contiguous word array at a time.
+SIMILARITY_FOLDER = "similarity"
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+ARRAY_FILES = {
+    "data": "data.npy",
+    "indices": "indices.npy",
+    "indptr": "indptr.npy",
+    "doc_ids": "doc_ids.npy",
+}
+LSH_ARRAY_FILES = {
+    "projection": "projection.npy",
+    "signatures": "signatures.npy",
+}
+BLOCK_ROWS = 16384
+BUILD_BATCH_SIZE = 4096
+LSH_CANDIDATES = 1000
+LSH_SEED = 0
+# Number of set bits of every byte value
+POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint16)
+
+def vectorizer_fingerprint(vectorizer):
+    # Changes with the vocabulary and idf weights of a TokenIdVectorizer or a sklearn TfidfVectorizer
+    digest = hashlib.blake2b(digest_size=8)
+    for name in ("id_to_column", "idf", "column_map", "idf_"):
+        array = getattr(vectorizer, name, None)
+        if array is not None:
+            digest.update(name.encode())
+            digest.update(np.ascontiguousarray(array).tobytes())
+    vocabulary = getattr(vectorizer, "vocabulary_", None)
+    if vocabulary is not None:
+        digest.update(repr(sorted((token, int(column)) for token, column in vocabulary.items())).encode())
+    return digest.hexdigest()
+
+def tfidf_rows(vectorizer, texts):
+    # float32 TF-IDF rows with unit L2 norm. The vectorizer already normalizes, but a pruned vocabulary
+    # (see utils.compaction) drops features after normalizing, so the rows are normalized again.
+    X = vectorizer.transform(texts)
+    return normalize(sp.csr_matrix(X, dtype=np.float32), norm="l2", copy=False)
+
+def top_k_positions(scores, docs, k):
+    # Positions of the k best positive scores, best first, ties by document
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > k:
+        # Everything scoring at least the k-th best score, so ties at the cut are broken by document too
+        kth_score = -np.partition(-scores[candidates], k - 1)[k - 1]
+        candidates = candidates[scores[candidates] >= kth_score]
+    return candidates[np.lexsort((docs[candidates], -scores[candidates]))][:k]
+
+def popcount(words):
+    if hasattr(np, "bitwise_count"):  # numpy >= 2.0
+        return np.bitwise_count(words)
+    return POPCOUNT[words.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+def hamming_distances(signatures, signature):
+    # signatures: (words, documents), signature: the words of one query
+    distances = np.zeros(signatures.shape[1], dtype=np.int32)
+    for document_words, query_word in zip(signatures, signature):
+        distances += popcount(document_words ^ query_word)
+    return distances
+
+class SimilarityIndex:
+    def __init__(self, arrays, n_features, fingerprint):
+        self.data = arrays["data"]
+        self.indices = arrays["indices"]
+        self.indptr = arrays["indptr"]
+        self.doc_ids = arrays["doc_ids"]
+        self.projection = arrays.get("projection")
+        self.signatures = arrays.get("signatures")
+        self.doc_count = len(self.indptr) - 1
+        self.n_features = n_features
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def build(cls, vectorizer, texts, doc_ids, lsh_bits=0):
+        # At least one batch, so an empty corpus still gets the vectorizer's number of features
+        X = sp.vstack([tfidf_rows(vectorizer, texts[start:start + BUILD_BATCH_SIZE])
+                       for start in range(0, max(len(texts), 1), BUILD_BATCH_SIZE)], format="csr")
+        arrays = {
+            "data": X.data.astype(np.float32),
+            "indices": X.indices.astype(np.int32),
+            "indptr": X.indptr.astype(np.int64),
+            "doc_ids": np.char.encode(np.asarray(doc_ids, dtype=str), "ascii"),
+        }
+        if lsh_bits:
+            if lsh_bits % 64:
+                raise ValueError(f"lsh_bits must be a multiple of 64, got {lsh_bits}")
+            rng = np.random.default_rng(LSH_SEED)
+            arrays["projection"] = np.where(rng.random((X.shape[1], lsh_bits)) < 0.5, -1, 1).astype(np.int8)
+        index = cls(arrays, X.shape[1], vectorizer_fingerprint(vectorizer))
+        if lsh_bits:
+            index.signatures = np.ascontiguousarray(np.concatenate(
+                [index.signatures_of(index.block(start, start + BUILD_BATCH_SIZE))
+                 for start in range(0, max(index.doc_count, 1), BUILD_BATCH_SIZE)]).T)
+        return index
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        if is_similarity_index(path):
+            os.remove(os.path.join(path, MANIFEST_FILE))
+        for name, filename in ARRAY_FILES.items():
+            np.save(os.path.join(path, filename), getattr(self, name), allow_pickle=False)
+        for name, filename in LSH_ARRAY_FILES.items():
+            if self.signatures is not None:
+                np.save(os.path.join(path, filename), getattr(self, name), allow_pickle=False)
+            elif os.path.exists(os.path.join(path, filename)):
+                os.remove(os.path.join(path, filename))
+        manifest = {
+            "format_version": FORMAT_VERSION,
+            "doc_count": self.doc_count,
+            "n_features": self.n_features,
+            "fingerprint": self.fingerprint,
+            "lsh_bits": 0 if self.projection is None else self.projection.shape[1],
+        }
+        # The manifest is written last so a half-written directory is never mistaken for an index
+        with open(os.path.join(path, MANIFEST_FILE), "w") as file:
+            json.dump(manifest, file, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        with open(os.path.join(path, MANIFEST_FILE)) as file:
+            manifest = json.load(file)
+        if manifest["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported similarity index format version {manifest['format_version']} in {path}")
+        files = dict(ARRAY_FILES, **(LSH_ARRAY_FILES if manifest["lsh_bits"] else {}))
+        arrays = {
+            name: np.load(os.path.join(path, filename), mmap_mode=mmap_mode, allow_pickle=False)
+            for name, filename in files.items()
+        }
+        return cls(arrays, manifest["n_features"], manifest["fingerprint"])
+
+    def block(self, start, stop):
+        # Rows [start, stop) as a CSR matrix; only their slice of the arrays is read
+        stop = min(stop, self.doc_count)
+        first, last = self.indptr[start], self.indptr[stop]
+        return sp.csr_matrix((self.data[first:last], self.indices[first:last], self.indptr[start:stop + 1] - first),
+                             shape=(stop - start, self.n_features))
+
+    def rows(self, docs):
+        # The given rows as a CSR matrix, in the given order
+        starts, stops = self.indptr[docs], self.indptr[docs + 1]
+        lengths = stops - starts
+        indptr = np.zeros(len(docs) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        take = np.repeat(starts - indptr[:-1], lengths) + np.arange(indptr[-1])
+        return sp.csr_matrix((self.data[take], self.indices[take], indptr), shape=(len(docs), self.n_features))
+
+    def signatures_of(self, X):
+        # (rows, words) signatures of the rows of X; only the projection rows of their features are read
+        features = np.unique(X.indices)
+        projected = X[:, features] @ self.projection[features].astype(np.float32)
+        return np.packbits(projected > 0, axis=1).view("<u8")
+
+    def nearest(self, Q, k=10, prefilter=False, candidates=LSH_CANDIDATES):
+        # The k most similar rows for every row of Q (unit-norm, as from tfidf_rows), as a list of
+        # (documents, cosine similarities) best first, ties by document. With prefilter, only the
+        # candidates rows closest to each query by signature Hamming distance are scored.
+        Q = sp.csr_matrix(Q, dtype=np.float32)
+        if prefilter:
+            return [self.nearest_prefiltered(Q[query], k, candidates) for query in range(Q.shape[0])]
+        return [self.nearest_exact(Q[query], k) for query in range(Q.shape[0])]
+
+    def nearest_exact(self, q, k):
+        # The scores are computed one block of rows at a time, keeping the best k in between. Only one
+        # query is made dense (one float per feature): a sparse block times a dense column is several
+        # times faster than a sparse-sparse product, and the column is no bigger than a table mapping
+        # the vocabulary to the query's features would be.
+        weights = q.toarray().ravel()
+        best_docs, best_scores = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        for start in range(0, self.doc_count, BLOCK_ROWS):
+            scores = self.block(start, start + BLOCK_ROWS) @ weights
+            docs = np.concatenate([best_docs, np.arange(start, start + len(scores))])
+            values = np.concatenate([best_scores, scores])
+            keep = top_k_positions(values, docs, k)
+            best_docs, best_scores = docs[keep], values[keep]
+        return best_docs, best_scores
+
+    def nearest_prefiltered(self, q, k, candidates):
+        distances = hamming_distances(self.signatures, self.signatures_of(q)[0])
+        docs = np.arange(self.doc_count)
+        if candidates < self.doc_count:
+            docs = np.sort(np.argpartition(distances, candidates - 1)[:candidates])
+        scores = self.rows(docs) @ q.toarray().ravel()
+        keep = top_k_positions(scores, docs, k)
+        return docs[keep], scores[keep]
+
+    def similar(self, vectorizer, text, k=10, prefilter=None):
+        # The k papers most similar to the text as (paper ids, similarities). Prefilters by signature
+        # whenever the index has signatures, unless prefilter is given.
+        if prefilter is None:
+            prefilter = self.signatures is not None
+        docs, scores = self.nearest(tfidf_rows(vectorizer, [text]), k, prefilter=prefilter)[0]
+        return np.char.decode(self.doc_ids[docs], "ascii").tolist(), scores
+
+    def size_bytes(self):
+        arrays = [getattr(self, name) for name in list(ARRAY_FILES) + list(LSH_ARRAY_FILES)]
+        return sum(array.nbytes for array in arrays if array is not None)
+
+def is_similarity_index(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+def build_similarity_index(data_path, vectorizer, lsh_bits=0):
+    papers_df = read_table(data_path, "papers", ["id", "title", "abstract"])
+    return SimilarityIndex.build(vectorizer, document_texts(papers_df), papers_df["id"].astype(str).to_numpy(), lsh_bits)
+
+def main(argv=None):
+    from utils.load_pipeline import Pipeline
+
+    parser = argparse.ArgumentParser(description="Build the similar-papers index in the pipeline's TF-IDF space.")
+    parser.add_argument("data_path", nargs="?", default="data/processed")
+    parser.add_argument("--pipeline-path", default="models/pipeline/pipeline.pkl", help="Pickled pipeline or artifact directory")
+    parser.add_argument("--lsh-bits", type=int, default=0, help="Store this many random-projection bits per paper to prefilter queries")
+    parser.add_argument("--query", action="append", default=[], help="Run a query against the built index")
+    args = parser.parse_args(argv)
+    vectorizer = Pipeline(args.pipeline_path, os.path.join(args.data_path, "subjects.csv")).vectorizer
+    index_path = os.path.join(args.data_path, SIMILARITY_FOLDER)
+    start = time.perf_counter()
+    index = build_similarity_index(args.data_path, vectorizer, args.lsh_bits)
+    index.save(index_path)
+    print(f"Indexed {index.doc_count} documents in {time.perf_counter() - start:.1f} s, "
+          f"{index.size_bytes() / 2 ** 20:.1f} MB in {index_path}")
+    index = SimilarityIndex.load(index_path)
+    for query in args.query:
+        start = time.perf_counter()
+        doc_ids, scores = index.similar(vectorizer, query)
+        print(f"{query!r}: {(time.perf_counter() - start) * 1000:.1f} ms")
+        for doc_id, score in zip(doc_ids, scores):
+            print(f"  {score:.3f}  {doc_id}")
+
+if __name__ == "__main__":
+    main()
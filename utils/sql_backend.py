@@ -0,0 +1,168 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.columnar import current_parquet_path, read_table
+from utils.cubes import group_code_counts, group_code_trends, top_keywords
+
+# Tables scanned from disk, with the columns the queries use
+FILE_TABLES = {
+    "papers": ["id", "publication_name", "publish_date"],
+    "paper_to_classification_code": ["paper_id", "code"],
+    "paper_to_affiliation": ["paper_id", "id"],
+    "paper_to_keyword": ["id", "keyword"],
+}
+
+def duckdb_available():
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+class DuckDBBackend:
+    # Answers the same queries as utils.cubes.DashboardCubes with aggregate SQL run by DuckDB directly over
+    # the processed Parquet files (see utils.columnar), so each query only scans the columns it needs, on all
+    # cores. A table without an up to date Parquet copy is read once with pandas and copied into the database instead:
+    # the processed CSVs end lines with "\r\r\n", which DuckDB's CSV reader rejects.
+    # classification_codes and affiliations are small and copied in from load_table(name), keeping their
+    # first row per id like the pandas path; a paper id listed twice takes its earliest year.
+    # Tables other than papers are set up by the first query that uses them.
+    # Filters other than the year range (utils.filter_index) are only supported by the pandas cubes.
+    supports_filters = False
+
+    def __init__(self, data_path, load_table, threads=None):
+        import duckdb
+
+        self.data_path = data_path
+        self.load_table = load_table
+        self.connection = duckdb.connect(":memory:")
+        self.lock = threading.Lock()
+        self.created = set()
+        if threads:
+            self.connection.execute(f"SET threads = {int(threads)}")
+
+        self.require("papers")
+        self.connection.execute("""
+            CREATE VIEW paper_rows AS
+            SELECT id, publication_name, year(TRY_CAST(publish_date AS TIMESTAMP)) AS year FROM papers
+        """)
+        self.connection.execute("""
+            CREATE VIEW paper_years AS
+            SELECT id, min(year) AS year FROM paper_rows WHERE year IS NOT NULL GROUP BY id
+        """)
+        self.years = self.query("SELECT DISTINCT year FROM paper_rows WHERE year IS NOT NULL ORDER BY year")["year"].to_numpy(np.int64)
+
+    def require(self, *tables):
+        with self.lock:
+            for table in tables:
+                if table not in self.created:
+                    self.create(table)
+                    self.created.add(table)
+
+    def create(self, table):
+        if table in FILE_TABLES:
+            parquet_path = current_parquet_path(self.data_path, table)
+            if parquet_path is not None:
+                quoted_path = parquet_path.replace("'", "''")
+                self.connection.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{quoted_path}')")
+            else:
+                self.create_table(table, read_table(self.data_path, table, FILE_TABLES[table]))
+        elif table == "code_keys":
+            codes = self.load_table("classification_codes")
+            codes = codes.dropna(subset=["code"]).drop_duplicates("code").reset_index(drop=True)
+            self.code_abbreviations = codes["abbreviation"].to_numpy(dtype=object)
+            self.code_names = codes["name"].to_numpy(dtype=object)
+            self.create_table("code_keys", pd.DataFrame({"code": codes["code"], "key": np.arange(len(codes))}))
+        elif table == "affiliation_countries":
+            affiliations = self.load_table("affiliations")
+            countries = affiliations.dropna(subset=["id"]).drop_duplicates("id")[["id", "country"]].astype({"country": object})
+            self.create_table("affiliation_countries", countries)
+        else:
+            raise ValueError(f"Unknown table: {table}")
+
+    def create_table(self, name, df):
+        # Copied into the database, registered DataFrames are only visible to the connection, not its cursors
+        self.connection.register(f"{name}_frame", df)
+        self.connection.execute(f"CREATE TABLE {name} AS SELECT * FROM {name}_frame")
+        self.connection.unregister(f"{name}_frame")
+
+    def check_filters(self, filters):
+        if filters:
+            raise ValueError("The DuckDB backend only filters by year range")
+
+    def query(self, sql, parameters=None):
+        # A cursor per query, so Streamlit sessions on different threads can query concurrently
+        return self.connection.cursor().execute(sql, parameters or []).df()
+
+    def paper_count(self, year_range, filters=()):
+        self.check_filters(filters)
+        return int(self.query("SELECT count(*) AS count FROM paper_rows WHERE year BETWEEN ? AND ?",
+                              list(year_range))["count"].iloc[0])
+
+    def publications_per_year(self, year_range, filters=()):
+        self.check_filters(filters)
+        frame = self.query("""
+            SELECT year AS publish_date, count(*) AS count FROM paper_rows
+            WHERE year BETWEEN ? AND ? GROUP BY year ORDER BY year
+        """, list(year_range))
+        return frame.astype({"publish_date": np.int64, "count": np.int64})
+
+    def journal_counts(self, year_range, filters=()):
+        self.check_filters(filters)
+        frame = self.query("""
+            SELECT publication_name AS label, count(*) AS count FROM paper_rows
+            WHERE year BETWEEN ? AND ? AND publication_name IS NOT NULL GROUP BY publication_name
+        """, list(year_range))
+        return frame.set_index("label")["count"].astype(np.int64).sort_index()
+
+    def code_counts(self, year_range, by_year):
+        self.require("paper_to_classification_code", "code_keys")
+        group = "papers.year, codes.key" if by_year else "codes.key"
+        return self.query(f"""
+            SELECT {group}, count(*) AS count
+            FROM paper_to_classification_code AS links
+            JOIN paper_years AS papers ON links.paper_id = papers.id
+            JOIN code_keys AS codes ON links.code = codes.code
+            WHERE papers.year BETWEEN ? AND ?
+            GROUP BY {group} ORDER BY {group}
+        """, list(year_range))
+
+    def classification_code_counts(self, year_range, filters=()):
+        self.check_filters(filters)
+        totals = self.code_counts(year_range, by_year=False)
+        keys = totals["key"].to_numpy(np.int64)
+        return group_code_counts(self.code_abbreviations[keys], self.code_names[keys], totals["count"].to_numpy(np.int64))
+
+    def classification_code_trends(self, year_range, filters=()):
+        self.check_filters(filters)
+        trends = self.code_counts(year_range, by_year=True)
+        return group_code_trends(trends["year"].to_numpy(np.int64),
+                                 self.code_abbreviations[trends["key"].to_numpy(np.int64)],
+                                 trends["count"].to_numpy(np.int64))
+
+    def country_counts(self, year_range, filters=()):
+        self.check_filters(filters)
+        self.require("paper_to_affiliation", "affiliation_countries")
+        frame = self.query("""
+            SELECT affiliations.country AS label, count(*) AS count
+            FROM paper_to_affiliation AS links
+            JOIN paper_years AS papers ON links.paper_id = papers.id
+            JOIN affiliation_countries AS affiliations ON links.id = affiliations.id
+            WHERE papers.year BETWEEN ? AND ? AND affiliations.country IS NOT NULL
+            GROUP BY affiliations.country
+        """, list(year_range))
+        return frame.set_index("label")["count"].astype(np.int64).sort_index()
+
+    def keyword_frequencies(self, year_range, limit, filters=()):
+        self.check_filters(filters)
+        self.require("paper_to_keyword")
+        frame = self.query("""
+            SELECT links.keyword, count(*) AS count
+            FROM paper_to_keyword AS links
+            JOIN paper_years AS papers ON links.id = papers.id
+            WHERE papers.year BETWEEN ? AND ? AND links.keyword IS NOT NULL
+            GROUP BY links.keyword ORDER BY count DESC, links.keyword LIMIT ?
+        """, [*year_range, limit])
+        return top_keywords(frame["keyword"].astype(str).to_numpy(dtype=object), frame["count"].to_numpy(np.int64), limit)